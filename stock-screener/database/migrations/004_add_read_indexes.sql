@@ -0,0 +1,17 @@
+-- Migración: Índices compuestos para las lecturas del cliente
+-- Ejecutar en Supabase SQL Editor
+--
+-- El SQL Editor corre el script en una transacción, por eso no se usa
+-- CREATE INDEX CONCURRENTLY. En tablas grandes, correr cada sentencia por
+-- separado agregando CONCURRENTLY para no bloquear escrituras.
+-- screener_runs(created_at DESC) ya existe en schema.sql.
+
+-- get_stocks_by_run / latest_stocks: filtro por run_id + orden por score
+CREATE INDEX IF NOT EXISTS idx_stocks_run_score ON stocks(run_id, score DESC);
+
+-- get_stock_history: filtro por símbolo + más recientes primero
+CREATE INDEX IF NOT EXISTS idx_stocks_symbol_created_at ON stocks(symbol, created_at DESC);
+
+-- Cubiertos por los compuestos (prefijo run_id / symbol)
+DROP INDEX IF EXISTS idx_stocks_run_id;
+DROP INDEX IF EXISTS idx_stocks_symbol;
@@ -0,0 +1,38 @@
+-- Migración: Limpieza de corridas del lado del servidor
+-- Ejecutar en Supabase SQL Editor
+--
+-- Reemplaza el fetch de todas las corridas + agrupado en Python de
+-- SupabaseClient.cleanup_keep_one_per_day por un único DELETE.
+
+-- Function: cleanup_keep_one_per_day
+-- Deja solo la corrida más reciente de cada día (UTC) y borra las que
+-- tienen más de keep_days días. Los stocks se borran por ON DELETE CASCADE.
+CREATE OR REPLACE FUNCTION cleanup_keep_one_per_day(keep_days INTEGER DEFAULT 30)
+RETURNS INTEGER AS $$
+DECLARE
+    deleted INTEGER;
+BEGIN
+    WITH ranked AS (
+        SELECT
+            id,
+            (created_at AT TIME ZONE 'UTC')::date AS run_date,
+            row_number() OVER (
+                PARTITION BY (created_at AT TIME ZONE 'UTC')::date
+                ORDER BY created_at DESC
+            ) AS rn
+        FROM screener_runs
+    )
+    DELETE FROM screener_runs r
+    USING ranked
+    WHERE r.id = ranked.id
+      AND (ranked.rn > 1 OR ranked.run_date < current_date - keep_days);
+
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    RETURN deleted;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Solo el backend (service_role) puede ejecutarla vía RPC
+REVOKE EXECUTE ON FUNCTION cleanup_keep_one_per_day(INTEGER) FROM PUBLIC, anon, authenticated;
+
+COMMENT ON FUNCTION cleanup_keep_one_per_day(INTEGER) IS 'Keeps the latest screener run per day and deletes runs older than keep_days';
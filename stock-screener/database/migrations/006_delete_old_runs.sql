@@ -0,0 +1,37 @@
+-- Migración: Borrado de corridas viejas del lado del servidor
+-- Ejecutar en Supabase SQL Editor
+--
+-- Reemplaza el fetch de los ids a conservar + DELETE ... NOT IN (ids) de
+-- SupabaseClient.delete_old_runs por un único DELETE con CTE.
+
+-- Function: delete_old_runs
+-- Conserva las keep_count corridas más recientes y borra el resto.
+-- Los stocks se borran por ON DELETE CASCADE.
+CREATE OR REPLACE FUNCTION delete_old_runs(keep_count INTEGER DEFAULT 30)
+RETURNS INTEGER AS $$
+DECLARE
+    deleted INTEGER;
+BEGIN
+    -- Igual que antes: sin corridas a conservar no se borra nada
+    IF keep_count <= 0 THEN
+        RETURN 0;
+    END IF;
+
+    WITH keep AS (
+        SELECT id
+        FROM screener_runs
+        ORDER BY created_at DESC
+        LIMIT keep_count
+    )
+    DELETE FROM screener_runs r
+    WHERE NOT EXISTS (SELECT 1 FROM keep WHERE keep.id = r.id);
+
+    GET DIAGNOSTICS deleted = ROW_COUNT;
+    RETURN deleted;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Solo el backend (service_role) puede ejecutarla vía RPC
+REVOKE EXECUTE ON FUNCTION delete_old_runs(INTEGER) FROM PUBLIC, anon, authenticated;
+
+COMMENT ON FUNCTION delete_old_runs(INTEGER) IS 'Keeps the keep_count most recent screener runs and deletes the rest';
@@ -17,7 +17,7 @@ from src.analysis.analyzer import StockAnalyzer
 from src.analysis.ai_scoring import AIScorer
 from src.analysis.trade_idea import TradeIdeaGenerator
 from src.analysis.price_performance import get_price_performance
-from src.db import SupabaseClient
+from src.db import get_supabase
 
 load_dotenv()
 
@@ -113,7 +113,7 @@ def run(
         # 3. Guardar en Supabase
         console.print(f"\n[cyan]Paso 3/4:[/cyan] Guardando en Supabase...")
 
-        db = SupabaseClient()
+        db = get_supabase()
         run_id = db.save_run_with_analysis(result, analyses)
 
         console.print(f"  [green]OK[/green] Guardado con Run ID: {run_id}")
@@ -39,7 +39,7 @@ def run(
     format: str = typer.Option(
         "json",
         "--format", "-f",
-        help="Formato de salida: json, csv, xlsx"
+        help="Formato de salida: json, csv, xlsx, feather, parquet"
     ),
     limit: int = typer.Option(
         None,
@@ -100,7 +100,7 @@ def run(
             if output:
                 # Detectar formato por extensión
                 ext = Path(output).suffix.lower()
-                if ext in [".json", ".csv", ".xlsx"]:
+                if ext in [".json", ".csv", ".xlsx", ".feather", ".parquet"]:
                     format = ext[1:]
                 
                 exporter = Exporter()
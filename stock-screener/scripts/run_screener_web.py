@@ -25,7 +25,7 @@ from loguru import logger
 from dotenv import load_dotenv
 
 from src.core import StockScreener
-from src.db import SupabaseClient
+from src.db import get_supabase
 
 # Cargar variables de entorno
 load_dotenv()
@@ -84,7 +84,7 @@ def run(
 
         # 2. Guardar en Supabase
         logger.info("Conectando a Supabase...")
-        db = SupabaseClient()
+        db = get_supabase()
 
         logger.info("Guardando resultados en Supabase...")
         run_id = db.save_run(result)
@@ -127,7 +127,7 @@ def test_connection():
     logger.info("Probando conexión a Supabase...")
 
     try:
-        db = SupabaseClient()
+        db = get_supabase()
 
         # Intentar obtener la última corrida
         latest = db.get_latest_run()
@@ -162,7 +162,7 @@ def cleanup(
     logger.info(f"Ejecutando cleanup (manteniendo últimas {keep_runs} corridas)...")
 
     try:
-        db = SupabaseClient()
+        db = get_supabase()
         deleted = db.delete_old_runs(keep_count=keep_runs)
         logger.info(f"Corridas eliminadas: {deleted}")
 
@@ -1,13 +1,16 @@
 """Cliente para Yahoo Finance - alternativa gratuita."""
 
+import asyncio
+import functools
 import time
+from concurrent.futures import Executor
 from datetime import datetime
 from typing import Optional
 import pandas as pd
 import yfinance as yf
 from loguru import logger
 
-from src.models.stock import Stock, StockMetrics
+from src.models.stock import Stock, StockMetrics, intern_label
 
 
 # Lista de símbolos del S&P 500 y NASDAQ 100 para screening
@@ -190,8 +193,8 @@ class YahooScreener:
                 symbol=symbol,
                 name=info.get("shortName") or info.get("longName", ""),
                 exchange=info.get("exchange", ""),
-                sector=info.get("sector", ""),
-                industry=info.get("industry", ""),
+                sector=intern_label(info.get("sector", "")),
+                industry=intern_label(info.get("industry", "")),
                 price=info.get("regularMarketPrice") or info.get("currentPrice", 0),
                 market_cap=info.get("marketCap", 0),
                 avg_volume=info.get("averageVolume", 0),
@@ -204,6 +207,31 @@ class YahooScreener:
             logger.warning(f"Error building stock {symbol}: {e}")
             return None
 
+    async def build_stock_async(
+        self,
+        symbol: str,
+        basic_data: dict = None,
+        executor: Optional[Executor] = None,
+    ) -> Optional[Stock]:
+        """
+        Versión awaitable de build_stock.
+
+        yfinance es bloqueante, así que la llamada corre en un thread del
+        executor indicado (o el default del loop) sin bloquear el event loop.
+
+        Args:
+            symbol: Símbolo de la acción
+            basic_data: Datos de get_stock_info (opcional)
+            executor: Executor donde correr el fetch (opcional)
+
+        Returns:
+            Stock con métricas completas
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, functools.partial(self.build_stock, symbol, basic_data)
+        )
+
     def close(self):
         """Cleanup (no-op for Yahoo)."""
         pass
@@ -0,0 +1,31 @@
+"""Kernel vectorizado para evaluar filtros de rango en batch."""
+
+import numpy as np
+
+
+def apply_ranges(
+    M: np.ndarray,
+    mins: np.ndarray,
+    maxs: np.ndarray,
+    required: np.ndarray,
+) -> np.ndarray:
+    """
+    Evalúa todos los filtros de rango sobre una matriz de métricas en una pasada.
+
+    Los límites ausentes se representan con -inf/+inf, así una sola
+    comparación cubre tanto el caso con límite como sin él.
+
+    Args:
+        M: Matriz float64 (n_stocks, n_filtros); NaN representa dato faltante
+        mins: Límite inferior por filtro (-inf si no hay)
+        maxs: Límite superior por filtro (+inf si no hay)
+        required: Si el filtro exige que el dato exista
+
+    Returns:
+        Vector bool (n_stocks,) con True para los stocks que pasan todos los filtros
+    """
+    if M.shape[1] == 0:
+        return np.ones(M.shape[0], dtype=bool)
+
+    in_range = (M >= mins) & (M <= maxs)
+    return np.where(np.isnan(M), ~required, in_range).all(axis=1)
@@ -1,9 +1,42 @@
 """Motor de filtros para el screener."""
 
-from typing import Optional, Callable
+from typing import Callable, Iterator, Optional
+
+import numpy as np
 from loguru import logger
 
-from src.models.stock import Stock
+from src.core.filter_kernel import apply_ranges
+from src.models.stock import METRIC_FIELDS, Stock, intern_label
+
+
+# Categorías de la config con filtros de rango sobre StockMetrics
+CATEGORIES = ("valuation", "growth", "profitability", "liquidity", "solvency")
+
+# Una fila por filtro de rango; límites ausentes como -inf/+inf
+BOUNDS_DTYPE = np.dtype([
+    ("category", "U16"),
+    ("metric", "U32"),
+    ("min", "f8"),
+    ("max", "f8"),
+    ("req", "?"),
+])
+
+_METRIC_FIELDS = frozenset(METRIC_FIELDS)
+
+
+def _yahoo_cheap_fields(info: dict) -> dict:
+    """
+    Campos baratos de un candidato de Yahoo ({"symbol", "info"}).
+
+    Devuelve las keys de CHEAP_FIELDS, leyendo info igual que
+    YahooScreener.build_stock.
+    """
+    return {
+        "pe": info.get("trailingPE") or info.get("forwardPE"),
+        "market_cap": info.get("marketCap"),
+        "sector": info.get("sector"),
+        "industry": info.get("industry"),
+    }
 
 
 class FilterEngine:
@@ -11,114 +44,222 @@ class FilterEngine:
     Motor de filtros configurable.
     Aplica criterios de valuación, crecimiento, rentabilidad y solidez financiera.
     """
+
+    # Orden de evaluación por categoría: primero los chequeos baratos y más selectivos.
+    # Las exclusiones de sector/industria (operabilidad) siempre van antes.
+    CATEGORY_PRIORITY = {
+        "valuation": 1,
+        "liquidity": 2,
+        "solvency": 3,
+        "profitability": 4,
+        "growth": 5,
+    }
     
-    def __init__(self, config: dict):
+    # Métricas disponibles en el candidato de Yahoo sin fetch adicional, con
+    # las keys que devuelve _yahoo_cheap_fields
+    CHEAP_FIELDS = {
+        "pe_ratio": "pe",
+        "market_cap": "market_cap",
+        "sector": "sector",
+        "industry": "industry",
+    }
+
+    def __init__(self, config: dict, debug: bool = False):
         """
         Inicializa el motor de filtros.
         
         Args:
             config: Configuración completa del screener
+            debug: Si True, passes_all usa el camino genérico (loguea el filtro fallido)
         """
         self.config = config
-        self.filters = self._build_filters()
-    
-    def _build_filters(self) -> list[tuple[str, Callable[[Stock], bool]]]:
-        """Construye lista de filtros desde la configuración."""
-        filters = []
-        
-        # Filtros de valuación
-        for metric, bounds in self.config.get("valuation", {}).items():
-            if bounds.get("min") is not None or bounds.get("max") is not None:
-                filters.append((
-                    f"valuation.{metric}",
-                    self._create_range_filter(metric, bounds)
-                ))
-        
-        # Filtros de crecimiento
-        for metric, bounds in self.config.get("growth", {}).items():
-            if bounds.get("min") is not None or bounds.get("max") is not None:
-                filters.append((
-                    f"growth.{metric}",
-                    self._create_range_filter(metric, bounds)
-                ))
-        
-        # Filtros de rentabilidad
-        for metric, bounds in self.config.get("profitability", {}).items():
-            if bounds.get("min") is not None or bounds.get("max") is not None:
-                filters.append((
-                    f"profitability.{metric}",
-                    self._create_range_filter(metric, bounds)
-                ))
-        
-        # Filtros de liquidez
-        for metric, bounds in self.config.get("liquidity", {}).items():
-            if bounds.get("min") is not None or bounds.get("max") is not None:
-                filters.append((
-                    f"liquidity.{metric}",
-                    self._create_range_filter(metric, bounds)
-                ))
-        
-        # Filtros de solvencia
-        for metric, bounds in self.config.get("solvency", {}).items():
-            if bounds.get("min") is not None or bounds.get("max") is not None:
-                filters.append((
-                    f"solvency.{metric}",
-                    self._create_range_filter(metric, bounds)
+        self.debug = debug
+
+        operability = config.get("operability", {})
+        self._excluded_sectors = frozenset(
+            map(intern_label, operability.get("exclude_sectors") or ())
+        )
+        self._excluded_industries = frozenset(
+            map(intern_label, operability.get("exclude_industries") or ())
+        )
+
+        # nombre de filtro -> [rechazos, evaluaciones] observados en evaluate()
+        self._reject_stats: dict[str, list[int]] = {}
+        self._set_bounds(self._build_bounds())
+        self._prefilters = self._build_prefilters()
+
+        logger.info(f"Filtros configurados: {len(self.filter_names)}")
+
+    @property
+    def filter_names(self) -> list[str]:
+        """Nombres de los filtros en orden de evaluación."""
+        names = []
+        if self._excluded_sectors:
+            names.append("operability.sector")
+        if self._excluded_industries:
+            names.append("operability.industry")
+        names.extend(name for name, *_ in self._rows)
+        return names
+
+    def _build_bounds(self) -> np.ndarray:
+        """
+        Construye la tabla de filtros de rango desde la configuración.
+
+        Returns:
+            Array estructurado (BOUNDS_DTYPE) con una fila por filtro, ordenado
+            por prioridad de evaluación; los límites ausentes son -inf/+inf
+        """
+        rows = []
+
+        for category in CATEGORIES:
+            for metric, bounds in self.config.get(category, {}).items():
+                min_val = bounds.get("min")
+                max_val = bounds.get("max")
+                if min_val is None and max_val is None:
+                    continue
+
+                rows.append((
+                    category,
+                    metric,
+                    -np.inf if min_val is None else min_val,
+                    np.inf if max_val is None else max_val,
+                    bounds.get("required", False),
                 ))
-        
-        # Filtros de operabilidad adicionales
-        operability = self.config.get("operability", {})
-        
-        if operability.get("exclude_sectors"):
-            filters.append((
-                "operability.sector",
-                lambda s: s.sector not in operability["exclude_sectors"]
-            ))
-        
-        if operability.get("exclude_industries"):
-            filters.append((
-                "operability.industry",
-                lambda s: s.industry not in operability["exclude_industries"]
-            ))
-        
-        logger.info(f"Filtros configurados: {len(filters)}")
-        return filters
-    
-    def _create_range_filter(
-        self,
-        metric: str,
-        bounds: dict
-    ) -> Callable[[Stock], bool]:
+
+        rows.sort(key=lambda r: self._filter_sort_key(r[0], r[1]))
+        return np.array(rows, dtype=BOUNDS_DTYPE)
+
+    def _set_bounds(self, bounds: np.ndarray):
+        """Instala una tabla de filtros y regenera lo que deriva de ella."""
+        self._bounds = bounds
+        self._rows = [
+            (f"{category}.{metric}", metric, min_val, max_val, required)
+            for category, metric, min_val, max_val, required in bounds.tolist()
+        ]
+        self._passes_all_source, self._passes_all = self._compile_passes_all()
+
+    def _filter_sort_key(self, category: str, metric: str) -> tuple[int, float]:
         """
-        Crea función de filtro para un rango.
+        Clave de orden de un filtro: prioridad de categoría y luego tasa de rechazo.
 
-        Args:
-            metric: Nombre de la métrica en StockMetrics
-            bounds: Dict con 'min' y/o 'max' y opcionalmente 'required'
+        La tasa observada en evaluate() tiene precedencia sobre el hint
+        'reject_rate' de la configuración.
+        """
+        rejected, evaluated = self._reject_stats.get(f"{category}.{metric}", (0, 0))
+
+        if evaluated:
+            reject_rate = rejected / evaluated
+        else:
+            reject_rate = self.config.get(category, {}).get(metric, {}).get("reject_rate", 0)
+
+        return self.CATEGORY_PRIORITY.get(category, 99), -reject_rate
+
+    def optimize_order(self):
+        """Reordena los filtros según las tasas de rechazo observadas y recompila passes_all."""
+        order = sorted(
+            range(len(self._bounds)),
+            key=lambda i: self._filter_sort_key(self._bounds["category"][i], self._bounds["metric"][i]),
+        )
+        self._set_bounds(self._bounds[order])
+
+    def _build_prefilters(self) -> list[tuple[str, float, float]]:
+        """
+        Construye los chequeos de rango evaluables con los datos del candidato.
 
         Returns:
-            Función que evalúa si el stock pasa el filtro
+            Lista de (campo del candidato, min, max)
         """
-        min_val = bounds.get("min")
-        max_val = bounds.get("max")
-        required = bounds.get("required", False)  # Por defecto, no requerido
+        prefilters = [
+            (self.CHEAP_FIELDS[metric], min_val, max_val)
+            for _, metric, min_val, max_val, _ in self._rows
+            if metric in self.CHEAP_FIELDS
+        ]
 
-        def filter_func(stock: Stock) -> bool:
-            value = getattr(stock.metrics, metric, None)
+        market_cap_min = self.config.get("operability", {}).get("market_cap_min")
+        if market_cap_min is not None:
+            prefilters.append((self.CHEAP_FIELDS["market_cap"], market_cap_min, np.inf))
 
-            # Si no hay dato, depende de si es requerido
-            if value is None:
-                return not required  # Pasa si no es requerido
+        return prefilters
 
-            if min_val is not None and value < min_val:
-                return False
+    def _compile_passes_all(self) -> tuple[str, Callable[[Stock], bool]]:
+        """
+        Genera una función passes_all especializada para esta configuración.
 
-            if max_val is not None and value > max_val:
-                return False
+        Emite código Python lineal con métricas, límites y flags 'required'
+        como literales, en el orden de filter_names.
 
-            return True
+        Returns:
+            Tuple de (código fuente, función compilada)
+        """
+        lines = ["def passes_all(s):", "    m = s.metrics"]
+        namespace = {
+            "_EXCL_SECTORS": self._excluded_sectors,
+            "_EXCL_INDUSTRIES": self._excluded_industries,
+        }
+
+        if self._excluded_sectors:
+            lines.append("    if s.sector in _EXCL_SECTORS:")
+            lines.append("        return False")
+
+        if self._excluded_industries:
+            lines.append("    if s.industry in _EXCL_INDUSTRIES:")
+            lines.append("        return False")
+
+        for _, metric, min_val, max_val, required in self._rows:
+            # Solo se inlinean campos conocidos; el resto se trata como dato faltante
+            if metric in _METRIC_FIELDS:
+                lines.append(f"    v = m.{metric}")
+            else:
+                lines.append("    v = None")
+
+            checks = []
+            if min_val != -np.inf:
+                checks.append(f"v < {min_val!r}")
+            if max_val != np.inf:
+                checks.append(f"v > {max_val!r}")
+            out_of_range = " or ".join(checks)
+
+            if required:
+                lines.append("    if v is None:")
+                lines.append("        return False")
+                lines.append(f"    if {out_of_range}:")
+            else:
+                lines.append(f"    if v is not None and ({out_of_range}):")
+            lines.append("        return False")
+
+        lines.append("    return True")
+        source = "\n".join(lines) + "\n"
+
+        exec(compile(source, "<FilterEngine.passes_all>", "exec"), namespace)
+        return source, namespace["passes_all"]
 
-        return filter_func
+    def iter_results(self, stock: Stock) -> Iterator[tuple[str, bool]]:
+        """
+        Genera (nombre, pasa) por cada filtro, en orden de evaluación.
+
+        Al ser lazy, quien solo necesita el primer fallo puede cortar
+        sin evaluar ni materializar el resto.
+
+        Args:
+            stock: Stock a evaluar
+
+        Yields:
+            Tuplas (nombre del filtro, pasa)
+        """
+        if self._excluded_sectors:
+            yield "operability.sector", stock.sector not in self._excluded_sectors
+        if self._excluded_industries:
+            yield "operability.industry", stock.industry not in self._excluded_industries
+
+        metrics = stock.metrics
+        for name, metric, min_val, max_val, required in self._rows:
+            value = getattr(metrics, metric, None)
+
+            # Si no hay dato, depende de si es requerido
+            if value is None:
+                yield name, not required
+            else:
+                yield name, not (value < min_val or value > max_val)
     
     def passes_all(self, stock: Stock) -> bool:
         """
@@ -130,12 +271,78 @@ class FilterEngine:
         Returns:
             True si pasa todos los filtros
         """
-        for filter_name, filter_func in self.filters:
-            if not filter_func(stock):
-                logger.debug(f"{stock.symbol} falló en {filter_name}")
-                return False
+        if not self.debug:
+            return self._passes_all(stock)
+
+        filter_name = self.first_failing_filter(stock)
+        if filter_name is not None:
+            logger.debug("{} falló en {}", stock.symbol, filter_name)
+            return False
         return True
     
+    def prefilter(self, candidate: dict) -> bool:
+        """
+        Descarta candidatos usando solo los campos que ya trae el screening inicial.
+
+        Solo los candidatos de Yahoo ({"symbol", "info"}) se evalúan: su info
+        es la misma que usa build_stock. Los de Finviz siempre pasan, porque
+        su P/E y market cap no coinciden con los de Yahoo que ve passes_all.
+        Un campo ausente nunca descarta: el dato detallado puede existir igual.
+
+        Args:
+            candidate: Dict del candidato
+
+        Returns:
+            False si el candidato seguro no pasa los filtros
+        """
+        info = candidate.get("info")
+        if not isinstance(info, dict):
+            return True
+        candidate = _yahoo_cheap_fields(info)
+
+        sector = candidate.get(self.CHEAP_FIELDS["sector"])
+        if sector and sector in self._excluded_sectors:
+            return False
+
+        industry = candidate.get(self.CHEAP_FIELDS["industry"])
+        if industry and industry in self._excluded_industries:
+            return False
+
+        for field_name, min_val, max_val in self._prefilters:
+            value = candidate.get(field_name)
+            if value is not None and (value < min_val or value > max_val):
+                return False
+
+        return True
+
+    def passes_batch(self, stocks: list[Stock]) -> np.ndarray:
+        """
+        Evalúa todos los filtros sobre una lista de stocks de forma vectorizada.
+
+        Args:
+            stocks: Stocks a evaluar
+
+        Returns:
+            Vector bool con True para cada stock que pasa todos los filtros
+        """
+        metric_order = self._bounds["metric"].tolist()
+        M = np.array(
+            [
+                [getattr(stock.metrics, metric, None) for metric in metric_order]
+                for stock in stocks
+            ],
+            dtype=np.float64,
+        ).reshape(len(stocks), len(metric_order))
+
+        keep = apply_ranges(M, self._bounds["min"], self._bounds["max"], self._bounds["req"])
+
+        if self._excluded_sectors:
+            keep &= np.array([s.sector not in self._excluded_sectors for s in stocks], dtype=bool)
+        if self._excluded_industries:
+            keep &= np.array([s.industry not in self._excluded_industries for s in stocks], dtype=bool)
+
+        return keep
+
     def evaluate(self, stock: Stock) -> dict[str, bool]:
         """
         Evalúa stock contra todos los filtros individualmente.
@@ -146,10 +353,14 @@ class FilterEngine:
         Returns:
             Dict con resultado de cada filtro
         """
-        return {
-            name: func(stock)
-            for name, func in self.filters
-        }
+        results = dict(self.iter_results(stock))
+
+        for name, passed in results.items():
+            stats = self._reject_stats.setdefault(name, [0, 0])
+            stats[0] += not passed
+            stats[1] += 1
+
+        return results
     
     def get_failing_filters(self, stock: Stock) -> list[str]:
         """
@@ -161,8 +372,19 @@ class FilterEngine:
         Returns:
             Lista de nombres de filtros fallidos
         """
-        return [
-            name
-            for name, func in self.filters
-            if not func(stock)
-        ]
+        return [name for name, passed in self.iter_results(stock) if not passed]
+
+    def first_failing_filter(self, stock: Stock) -> Optional[str]:
+        """
+        Obtiene el primer filtro que el stock no pasa, sin evaluar el resto.
+
+        Args:
+            stock: Stock a evaluar
+
+        Returns:
+            Nombre del filtro fallido, o None si pasa todos
+        """
+        for name, passed in self.iter_results(stock):
+            if not passed:
+                return name
+        return None
@@ -1,14 +1,42 @@
 """Motor de scoring para rankear stocks."""
 
+import heapq
 from typing import Optional
+
+import numpy as np
+
 from src.models.stock import Stock
 
 
+# Orden de las columnas en el breakdown de score_batch
+CATEGORIES = ("valuation", "growth", "profitability", "financial_health")
+
+_NAN = float("nan")
+
+
+def _or_nan(value: Optional[float]) -> float:
+    """Convierte un dato faltante (None) en NaN para el scoring branchless."""
+    return _NAN if value is None else value
+
+
+def _metric_array(stocks: list[Stock], metric: str) -> np.ndarray:
+    """Extrae una métrica de todos los stocks como float64 (None -> NaN)."""
+    return np.array([getattr(s.metrics, metric) for s in stocks], dtype=np.float64)
+
+
 class ScoringEngine:
     """
     Motor de scoring para rankear stocks que pasan los filtros.
     Asigna puntaje basado en qué tan bien cumple cada criterio.
     """
+
+    # Score máximo de cada categoría (todas se recortan a 0-10)
+    MAX_PER_CAT = {
+        "valuation": 10,
+        "growth": 10,
+        "profitability": 10,
+        "financial_health": 10,
+    }
     
     def __init__(self, config: dict):
         """
@@ -24,6 +52,26 @@ class ScoringEngine:
             "profitability": 0.25,
             "financial_health": 0.25,
         })
+
+        # Pesos alineados con CATEGORIES: vector para el batch, tupla para el camino escalar
+        # (crear un ndarray por stock cuesta más que las 4 multiplicaciones)
+        self._w = np.array([self.weights.get(cat, 0.0) for cat in CATEGORIES], dtype=np.float64)
+        self._w_scalar = tuple(self._w.tolist())
+
+        # Para el corte dinámico: calcular primero las categorías de mayor peso
+        # y precomputar el máximo aporte posible de las que quedan (un peso
+        # negativo aporta como máximo 0, con la categoría en 0 puntos)
+        self._scorers = {
+            "valuation": self._score_valuation,
+            "growth": self._score_growth,
+            "profitability": self._score_profitability,
+            "financial_health": self._score_financial_health,
+        }
+        self._bound_order = sorted(CATEGORIES, key=lambda c: self.weights.get(c, 0), reverse=True)
+        self._remaining_max = [
+            sum(self.MAX_PER_CAT[c] * max(self.weights.get(c, 0), 0.0) for c in self._bound_order[i + 1:])
+            for i in range(len(self._bound_order))
+        ]
     
     def score(self, stock: Stock) -> tuple[float, dict]:
         """
@@ -50,41 +98,181 @@ class ScoringEngine:
         breakdown["financial_health"] = self._score_financial_health(stock)
         
         # Score ponderado
-        total = sum(
-            breakdown.get(cat, 0) * self.weights.get(cat, 0)
-            for cat in self.weights
-        )
-        
-        return round(total, 2), breakdown
+        return self._weighted_total(breakdown), breakdown
+
+    def _weighted_total(self, breakdown: dict) -> float:
+        """Score ponderado (redondeado) de un breakdown ordenado según CATEGORIES."""
+        total = sum(b * w for b, w in zip(breakdown.values(), self._w_scalar))
+        return round(total, 2)
     
+    def score_with_bound(self, stock: Stock, s_min: float) -> Optional[tuple[float, dict]]:
+        """
+        Calcula el score salvo que no pueda alcanzar s_min.
+
+        Después de cada categoría acota el total con el máximo posible de las
+        restantes; si esa cota queda por debajo de s_min, abandona.
+
+        Args:
+            stock: Stock a evaluar
+            s_min: Score mínimo que debe poder alcanzar
+
+        Returns:
+            Lo mismo que score(), o None si el stock no puede llegar a s_min
+        """
+        partial = {}
+        realized = 0.0
+
+        for cat, remaining_max in zip(self._bound_order, self._remaining_max):
+            partial[cat] = self._scorers[cat](stock)
+            realized += partial[cat] * self.weights.get(cat, 0)
+            if realized + remaining_max < s_min:
+                return None
+
+        breakdown = {cat: partial[cat] for cat in CATEGORIES}
+        return self._weighted_total(breakdown), breakdown
+
+    def top_k(self, stocks: list[Stock], k: int) -> list[Stock]:
+        """
+        Asigna score y devuelve los k stocks de mayor score, ordenados.
+
+        Con más de k stocks mantiene un min-heap de los k mejores y usa su raíz
+        como corte para score_with_bound, salteando el scoring completo de los
+        que no pueden entrar. A igual score gana el que aparece primero.
+
+        Args:
+            stocks: Stocks a rankear
+            k: Cantidad de resultados
+
+        Returns:
+            Los k mejores stocks, con score y score_breakdown asignados
+        """
+        if k <= 0:
+            return []
+
+        if len(stocks) <= k:
+            if stocks:
+                scores, breakdown = self.score_batch(stocks)
+                for stock, score, row in zip(stocks, scores.tolist(), breakdown.tolist()):
+                    stock.score = score
+                    stock.score_breakdown = dict(zip(CATEGORIES, row))
+            return sorted(stocks, key=lambda s: s.score or 0, reverse=True)
+
+        heap = []  # (score, -posición, stock): la raíz es el peor de los k
+        for i, stock in enumerate(stocks):
+            s_min = heap[0][0] if len(heap) == k else float("-inf")
+            scored = self.score_with_bound(stock, s_min)
+            if scored is None:
+                continue
+
+            stock.score, stock.score_breakdown = scored
+            entry = (stock.score, -i, stock)
+            if len(heap) < k:
+                heapq.heappush(heap, entry)
+            elif entry[:2] > heap[0][:2]:
+                heapq.heapreplace(heap, entry)
+
+        return [stock for _, _, stock in sorted(heap, key=lambda e: e[:2], reverse=True)]
+
+    def score_batch(self, stocks: list[Stock]) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Calcula scores de muchos stocks a la vez con operaciones vectorizadas.
+
+        Equivale a llamar score() por cada stock: los NaN (métricas
+        faltantes) no cumplen ninguna condición, igual que el chequeo de None.
+
+        Args:
+            stocks: Stocks a evaluar
+
+        Returns:
+            Tuple de (scores (n,), breakdown (n, 4) en el orden de CATEGORIES)
+        """
+        breakdown = np.column_stack([
+            self._score_valuation_batch(stocks),
+            self._score_growth_batch(stocks),
+            self._score_profitability_batch(stocks),
+            self._score_financial_health_batch(stocks),
+        ]).reshape(len(stocks), len(CATEGORIES))
+
+        total = breakdown @ self._w
+
+        return np.round(total, 2), breakdown
+
+    def _score_valuation_batch(self, stocks: list[Stock]) -> np.ndarray:
+        """Versión vectorizada de _score_valuation."""
+        peg = _metric_array(stocks, "peg_ratio")
+        pe = _metric_array(stocks, "pe_ratio")
+
+        score = np.full(len(stocks), 5.0)
+        score += np.select([peg <= 0.5, peg <= 0.75, peg <= 1, peg > 1.5], [3, 2, 1, -2], 0)
+        score += np.select(
+            [(pe >= 10) & (pe <= 20), (pe >= 5) & (pe <= 30), pe > 50], [2, 1, -2], 0
+        )
+        return np.clip(score, 0, 10)
+
+    def _score_growth_batch(self, stocks: list[Stock]) -> np.ndarray:
+        """Versión vectorizada de _score_growth."""
+        growth = _metric_array(stocks, "eps_growth_5y") * 100
+        revenue_growth = _metric_array(stocks, "revenue_growth_5y")
+
+        score = np.full(len(stocks), 5.0)
+        score += np.select(
+            [growth >= 20, growth >= 15, growth >= 10, growth < 5], [3, 2, 1, -1], 0
+        )
+        score += revenue_growth > 0.1
+        return np.clip(score, 0, 10)
+
+    def _score_profitability_batch(self, stocks: list[Stock]) -> np.ndarray:
+        """Versión vectorizada de _score_profitability."""
+        roe = _metric_array(stocks, "roe")
+        roe_pct = np.where(roe < 1, roe * 100, roe)
+        net_margin = _metric_array(stocks, "net_margin")
+        roa = _metric_array(stocks, "roa")
+
+        score = np.full(len(stocks), 5.0)
+        score += np.select(
+            [roe_pct >= 25, roe_pct >= 20, roe_pct >= 15, roe_pct < 10], [3, 2, 1, -1], 0
+        )
+        score += np.select([net_margin > 0.15, net_margin > 0.10], [1, 0.5], 0)
+        score += roa > 0.10
+        return np.clip(score, 0, 10)
+
+    def _score_financial_health_batch(self, stocks: list[Stock]) -> np.ndarray:
+        """Versión vectorizada de _score_financial_health."""
+        current = _metric_array(stocks, "current_ratio")
+        quick = _metric_array(stocks, "quick_ratio")
+        debt = _metric_array(stocks, "debt_to_equity")
+
+        score = np.full(len(stocks), 5.0)
+        score += np.select(
+            [current >= 2.5, current >= 2, current >= 1.5, current < 1], [2, 1.5, 1, -2], 0
+        )
+        score += np.select([quick >= 1.5, quick >= 1, quick < 0.5], [1.5, 1, -1], 0)
+        score += np.select(
+            [debt <= 0.2, debt <= 0.3, debt <= 0.5, debt > 1], [2, 1.5, 1, -2], 0
+        )
+        return np.clip(score, 0, 10)
+
+    # Las funciones escalares son branchless: cada tramo es un bool que se
+    # suma como 0/1. Un dato faltante entra como NaN, que hace falsa toda
+    # comparación y por lo tanto no suma ni resta nada.
+
     def _score_valuation(self, stock: Stock) -> float:
         """
         Score de valuación (0-10).
         Menor PEG y P/E razonable = mejor.
         """
-        score = 5.0  # Base
         metrics = stock.metrics
-        
+        peg = _or_nan(metrics.peg_ratio)
+        pe = _or_nan(metrics.pe_ratio)
+
+        score = 5.0  # Base
+
         # PEG: mejor si más bajo (pero positivo)
-        if metrics.peg_ratio is not None:
-            if metrics.peg_ratio <= 0.5:
-                score += 3
-            elif metrics.peg_ratio <= 0.75:
-                score += 2
-            elif metrics.peg_ratio <= 1:
-                score += 1
-            elif metrics.peg_ratio > 1.5:
-                score -= 2
-        
-        # P/E: penalizar extremos
-        if metrics.pe_ratio is not None:
-            if 10 <= metrics.pe_ratio <= 20:
-                score += 2  # Rango ideal
-            elif 5 <= metrics.pe_ratio <= 30:
-                score += 1
-            elif metrics.pe_ratio > 50:
-                score -= 2
-        
+        score += (peg <= 1) + (peg <= 0.75) + (peg <= 0.5) - 2 * (peg > 1.5)
+
+        # P/E: 10-20 es el rango ideal (+2), 5-30 aceptable (+1), >50 penaliza
+        score += (5 <= pe <= 30) + (10 <= pe <= 20) - 2 * (pe > 50)
+
         return max(0, min(10, score))
     
     def _score_growth(self, stock: Stock) -> float:
@@ -92,27 +280,18 @@ class ScoringEngine:
         Score de crecimiento (0-10).
         Mayor crecimiento proyectado = mejor.
         """
-        score = 5.0
         metrics = stock.metrics
-        
+        growth = _or_nan(metrics.eps_growth_5y) * 100  # Convertir a %
+        revenue_growth = _or_nan(metrics.revenue_growth_5y)
+
+        score = 5.0
+
         # EPS growth 5Y
-        if metrics.eps_growth_5y is not None:
-            growth = metrics.eps_growth_5y * 100  # Convertir a %
-            
-            if growth >= 20:
-                score += 3
-            elif growth >= 15:
-                score += 2
-            elif growth >= 10:
-                score += 1
-            elif growth < 5:
-                score -= 1
-        
+        score += (growth >= 10) + (growth >= 15) + (growth >= 20) - (growth < 5)
+
         # Revenue growth (bonus)
-        if metrics.revenue_growth_5y is not None:
-            if metrics.revenue_growth_5y > 0.1:
-                score += 1
-        
+        score += revenue_growth > 0.1
+
         return max(0, min(10, score))
     
     def _score_profitability(self, stock: Stock) -> float:
@@ -120,34 +299,23 @@ class ScoringEngine:
         Score de rentabilidad (0-10).
         Mayor ROE y márgenes = mejor.
         """
-        score = 5.0
         metrics = stock.metrics
-        
+        roe = _or_nan(metrics.roe)
+        roe_pct = roe * (1 + 99 * (roe < 1))  # ROE < 1 viene como fracción
+        net_margin = _or_nan(metrics.net_margin)
+        roa = _or_nan(metrics.roa)
+
+        score = 5.0
+
         # ROE
-        if metrics.roe is not None:
-            roe_pct = metrics.roe * 100 if metrics.roe < 1 else metrics.roe
-            
-            if roe_pct >= 25:
-                score += 3
-            elif roe_pct >= 20:
-                score += 2
-            elif roe_pct >= 15:
-                score += 1
-            elif roe_pct < 10:
-                score -= 1
-        
+        score += (roe_pct >= 15) + (roe_pct >= 20) + (roe_pct >= 25) - (roe_pct < 10)
+
         # Margen neto (bonus)
-        if metrics.net_margin is not None:
-            if metrics.net_margin > 0.15:
-                score += 1
-            elif metrics.net_margin > 0.10:
-                score += 0.5
-        
+        score += 0.5 * (net_margin > 0.10) + 0.5 * (net_margin > 0.15)
+
         # ROA (bonus)
-        if metrics.roa is not None:
-            if metrics.roa > 0.10:
-                score += 1
-        
+        score += roa > 0.10
+
         return max(0, min(10, score))
     
     def _score_financial_health(self, stock: Stock) -> float:
@@ -155,38 +323,20 @@ class ScoringEngine:
         Score de salud financiera (0-10).
         Mejor liquidez y menor deuda = mejor.
         """
-        score = 5.0
         metrics = stock.metrics
-        
+        current = _or_nan(metrics.current_ratio)
+        quick = _or_nan(metrics.quick_ratio)
+        debt = _or_nan(metrics.debt_to_equity)
+
+        score = 5.0
+
         # Current ratio
-        if metrics.current_ratio is not None:
-            if metrics.current_ratio >= 2.5:
-                score += 2
-            elif metrics.current_ratio >= 2:
-                score += 1.5
-            elif metrics.current_ratio >= 1.5:
-                score += 1
-            elif metrics.current_ratio < 1:
-                score -= 2
-        
+        score += (current >= 1.5) + 0.5 * (current >= 2) + 0.5 * (current >= 2.5) - 2 * (current < 1)
+
         # Quick ratio
-        if metrics.quick_ratio is not None:
-            if metrics.quick_ratio >= 1.5:
-                score += 1.5
-            elif metrics.quick_ratio >= 1:
-                score += 1
-            elif metrics.quick_ratio < 0.5:
-                score -= 1
-        
+        score += (quick >= 1) + 0.5 * (quick >= 1.5) - (quick < 0.5)
+
         # Debt/Equity
-        if metrics.debt_to_equity is not None:
-            if metrics.debt_to_equity <= 0.2:
-                score += 2
-            elif metrics.debt_to_equity <= 0.3:
-                score += 1.5
-            elif metrics.debt_to_equity <= 0.5:
-                score += 1
-            elif metrics.debt_to_equity > 1:
-                score -= 2
-        
+        score += (debt <= 0.5) + 0.5 * (debt <= 0.3) + 0.5 * (debt <= 0.2) - 2 * (debt > 1)
+
         return max(0, min(10, score))
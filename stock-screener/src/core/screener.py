@@ -1,11 +1,15 @@
 """Lógica principal del screener de acciones."""
 
-import json
+import asyncio
+import copy
+import functools
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from datetime import datetime
 from typing import Optional
 
+import orjson
 from loguru import logger
 
 from src.api.yahoo_screener import YahooScreener
@@ -13,6 +17,13 @@ from src.api.finviz import FinvizClient
 from src.models.stock import Stock, StockMetrics, ScreenerResult
 from src.core.filters import FilterEngine
 from src.core.scoring import ScoringEngine
+from src.core.stock_cache import cache_stocks
+
+
+@functools.cache
+def _load_raw(path: str) -> dict:
+    """Lee y parsea un JSON de config una sola vez por proceso (path resuelto)."""
+    return orjson.loads(Path(path).read_bytes())
 
 
 class StockScreener:
@@ -39,6 +50,10 @@ class StockScreener:
 
         # Inicializar componentes
         self.yahoo_client = YahooScreener()
+        self._stock_cache = None
+        if self.use_cache:
+            self._stock_cache = cache_stocks(self.yahoo_client.build_stock)
+            self.yahoo_client.build_stock = self._stock_cache
         self.finviz_client = None
         if self.data_source == "finviz":
             self.finviz_client = FinvizClient()
@@ -55,8 +70,8 @@ class StockScreener:
         if not config_path.exists():
             raise FileNotFoundError(f"Config no encontrada: {path}")
         
-        with open(config_path) as f:
-            config = json.load(f)
+        # Copia: el dict cacheado es compartido entre screeners
+        config = copy.deepcopy(_load_raw(str(config_path.resolve())))
         
         # Si extiende otra config, mergear
         if "extends" in config:
@@ -68,16 +83,20 @@ class StockScreener:
     
     def _merge_config(self, base: dict, override: dict) -> dict:
         """Mergea configuraciones (override sobre base)."""
-        result = base.copy()
-        
-        for key, value in override.items():
-            if key == "extends":
-                continue
-            if isinstance(value, dict) and key in result:
-                result[key] = self._merge_config(result[key], value)
-            else:
-                result[key] = value
-        
+        result = copy.deepcopy(base)
+
+        # Recorrido iterativo: (dict destino, dict con overrides)
+        stack = [(result, override)]
+        while stack:
+            target, source = stack.pop()
+            for key, value in source.items():
+                if key == "extends":
+                    continue
+                if isinstance(value, dict) and isinstance(target.get(key), dict):
+                    stack.append((target[key], value))
+                else:
+                    target[key] = value
+
         return result
     
     def run(self, limit: Optional[int] = None) -> ScreenerResult:
@@ -95,6 +114,125 @@ class StockScreener:
 
         logger.info("Iniciando screener...")
 
+        candidates, total_scanned = self._get_candidates(limit, errors)
+
+        # Paso 2: Construir stocks con Yahoo (métricas detalladas) y aplicar filtros.
+        # build_stock es casi todo I/O de red, así que se despacha a un pool de threads.
+        execution = self.config.get("execution", {})
+        max_workers = execution.get("max_workers", 16)
+        chunk_size = execution.get("chunk_size", 200)
+
+        # Resultados por índice de candidato: el orden final es el de entrada,
+        # no el de llegada (max_results y los empates de score dependen de él)
+        passing: list[Optional[Stock]] = [None] * len(candidates)
+        build_errors: list[Optional[str]] = [None] * len(candidates)
+        processed = 0
+        n_passing = 0
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for start in range(0, len(candidates), chunk_size):
+                chunk = candidates[start:start + chunk_size]
+                futures = {
+                    executor.submit(self.yahoo_client.build_stock, c["symbol"], c): index
+                    for index, c in enumerate(chunk, start)
+                }
+
+                for future in as_completed(futures):
+                    index = futures[future]
+                    symbol = candidates[index]["symbol"]
+                    processed += 1
+
+                    try:
+                        passing[index] = self._accept(symbol, future.result())
+                        n_passing += passing[index] is not None
+                    except Exception as e:
+                        logger.warning(f"Error procesando {symbol}: {e}")
+                        build_errors[index] = f"{symbol}: {str(e)}"
+
+                    # Progress log cada 50 stocks
+                    if processed % 50 == 0:
+                        logger.info(f"Progreso: {processed}/{len(candidates)} procesados, {n_passing} passing")
+
+                # Escribir en una transacción los stocks cacheados de la tanda
+                self._flush_stock_cache()
+
+        passing_stocks = [s for s in passing if s is not None]
+        errors.extend(e for e in build_errors if e is not None)
+        return self._build_result(passing_stocks, total_scanned, errors, start_time)
+
+    async def run_async(self, limit: Optional[int] = None) -> ScreenerResult:
+        """
+        Ejecuta el screener completo desde un event loop.
+
+        Los fetch se lanzan como tasks acotadas por un semáforo
+        (execution.max_concurrency) y cada resultado se filtra apenas llega.
+
+        Args:
+            limit: Límite de stocks a procesar (para testing)
+
+        Returns:
+            ScreenerResult con stocks que pasan todos los filtros
+        """
+        start_time = time.time()
+        errors = []
+
+        logger.info("Iniciando screener (async)...")
+
+        candidates, total_scanned = await asyncio.to_thread(
+            self._get_candidates, limit, errors
+        )
+
+        # Paso 2: fetch concurrente; el filtrado (µs por stock) corre en el loop
+        max_concurrency = self.config.get("execution", {}).get("max_concurrency", 64)
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        # Resultados por índice de candidato, como en run()
+        passing: list[Optional[Stock]] = [None] * len(candidates)
+        build_errors: list[Optional[str]] = [None] * len(candidates)
+        processed = 0
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+
+            async def process(index: int, candidate: dict) -> None:
+                symbol = candidate["symbol"]
+                try:
+                    async with semaphore:
+                        stock = await self.yahoo_client.build_stock_async(
+                            symbol, candidate, executor=executor
+                        )
+                    passing[index] = self._accept(symbol, stock)
+                except Exception as e:
+                    logger.warning(f"Error procesando {symbol}: {e}")
+                    build_errors[index] = f"{symbol}: {str(e)}"
+
+            tasks = [asyncio.create_task(process(i, c)) for i, c in enumerate(candidates)]
+
+            for next_done in asyncio.as_completed(tasks):
+                await next_done
+                processed += 1
+
+                # Progress log cada 50 stocks
+                if processed % 50 == 0:
+                    n_passing = len(passing) - passing.count(None)
+                    logger.info(f"Progreso: {processed}/{len(candidates)} procesados, {n_passing} passing")
+
+        self._flush_stock_cache()
+
+        passing_stocks = [s for s in passing if s is not None]
+        errors.extend(e for e in build_errors if e is not None)
+        return self._build_result(passing_stocks, total_scanned, errors, start_time)
+
+    def _get_candidates(self, limit: Optional[int], errors: list[str]) -> tuple[list[dict], int]:
+        """
+        Obtiene el universo inicial y descarta lo que el prefiltro ya rechaza.
+
+        Args:
+            limit: Límite de stocks a procesar
+            errors: Lista donde registrar errores del screening inicial
+
+        Returns:
+            Tuple de (candidatos a construir, total escaneado)
+        """
         # Paso 1: Obtener universo inicial según data_source
         operability = self.config.get("operability", {})
 
@@ -129,51 +267,54 @@ class StockScreener:
         if limit:
             candidates = candidates[:limit]
 
-        # Paso 2: Construir stocks con Yahoo (métricas detalladas) y aplicar filtros
-        passing_stocks = []
-        total_scanned = 0
-
-        for i, candidate in enumerate(candidates):
-            symbol = candidate.get("symbol")
+        candidates = [c for c in candidates if c.get("symbol")]
+        total_scanned = len(candidates)
 
-            if not symbol:
-                continue
+        # Descartar con los datos baratos del candidato antes del fetch detallado
+        candidates = [c for c in candidates if self.filter_engine.prefilter(c)]
+        prefilter_rejected = total_scanned - len(candidates)
+        if prefilter_rejected:
+            logger.info(f"Prefiltro descartó {prefilter_rejected}/{total_scanned} candidatos")
 
-            total_scanned += 1
+        return candidates, total_scanned
 
-            try:
-                # Construir Stock con métricas completas desde Yahoo
-                stock = self.yahoo_client.build_stock(symbol, candidate)
+    def _flush_stock_cache(self) -> None:
+        """Escribe los stocks construidos que el cache tiene pendientes."""
+        if self._stock_cache is not None:
+            self._stock_cache.flush()
 
-                if not stock:
-                    continue
-
-                # Aplicar filtros (verificación adicional con datos detallados)
-                if self.filter_engine.passes_all(stock):
-                    # Calcular score
-                    if self.config.get("scoring", {}).get("enabled"):
-                        stock.score, stock.score_breakdown = self.scoring_engine.score(stock)
+    def _accept(self, symbol: str, stock: Optional[Stock]) -> Optional[Stock]:
+        """Aplica los filtros a un stock construido; lo devuelve si pasa, si no None."""
+        if not stock:
+            return None
 
-                    passing_stocks.append(stock)
-                    logger.debug(f"✓ {symbol} (score: {stock.score})")
-                else:
-                    logger.debug(f"✗ {symbol}")
+        # Aplicar filtros (verificación adicional con datos detallados)
+        if self.filter_engine.passes_all(stock):
+            logger.debug("✓ {}", symbol)
+            return stock
 
-            except Exception as e:
-                logger.warning(f"Error procesando {symbol}: {e}")
-                errors.append(f"{symbol}: {str(e)}")
+        logger.opt(lazy=True).debug(
+            "✗ {} ({})",
+            lambda: symbol,
+            lambda: self.filter_engine.first_failing_filter(stock),
+        )
+        return None
 
-            # Progress log cada 50 stocks
-            if (i + 1) % 50 == 0:
-                logger.info(f"Progreso: {i + 1}/{len(candidates)} procesados, {len(passing_stocks)} passing")
+    def _build_result(
+        self,
+        passing_stocks: list[Stock],
+        total_scanned: int,
+        errors: list[str],
+        start_time: float,
+    ) -> ScreenerResult:
+        """Calcula scores, recorta a max_results y arma el ScreenerResult."""
+        # Paso 3: Calcular score y quedarse con los mejores max_results
+        max_results = self.config.get("output", {}).get("max_results", 100)
 
-        # Paso 3: Ordenar por score
         if self.config.get("scoring", {}).get("enabled"):
-            passing_stocks.sort(key=lambda s: s.score or 0, reverse=True)
-
-        # Limitar resultados
-        max_results = self.config.get("output", {}).get("max_results", 100)
-        passing_stocks = passing_stocks[:max_results]
+            passing_stocks = self.scoring_engine.top_k(passing_stocks, max_results)
+        else:
+            passing_stocks = passing_stocks[:max_results]
 
         execution_time = time.time() - start_time
 
@@ -0,0 +1,74 @@
+"""Cache persistente de stocks construidos, por símbolo y día."""
+
+import threading
+from datetime import date, timedelta
+from functools import wraps
+from typing import Callable, Optional
+
+from loguru import logger
+
+from src.models.stock import Stock
+from src.utils.cache import CacheManager, get_cache
+
+
+# Incrementar cuando cambie la forma de Stock/StockMetrics para invalidar el cache
+SCHEMA_VERSION = 1
+
+
+def cache_stocks(
+    build_stock: Callable[..., Optional[Stock]],
+    cache: Optional[CacheManager] = None,
+    flush_every: int = 50,
+) -> Callable[..., Optional[Stock]]:
+    """
+    Envuelve un build_stock para reutilizar los stocks ya construidos en el día.
+
+    La key incluye símbolo, fecha y SCHEMA_VERSION, así que re-ejecutar el
+    screener con otros umbrales no vuelve a consultar la red.
+
+    Los stocks nuevos se acumulan y se escriben con set_many cada
+    flush_every entradas; wrapper.flush() escribe lo pendiente (el screener
+    lo llama al cerrar cada tanda).
+
+    Args:
+        build_stock: Función (symbol, basic_data) -> Stock
+        cache: CacheManager a usar (default: cache global)
+        flush_every: Entradas pendientes que disparan una escritura
+
+    Returns:
+        Función con la misma firma que consulta el cache antes de construir
+    """
+    cache = cache or get_cache()
+    ttl = timedelta(days=1)
+
+    # key -> stock.to_dict() aún no escritos; accedido desde varios threads
+    pending: dict[str, dict] = {}
+    lock = threading.Lock()
+
+    def flush() -> None:
+        with lock:
+            items = [(key, data, ttl, "stock") for key, data in pending.items()]
+            pending.clear()
+        cache.set_many(items)
+
+    @wraps(build_stock)
+    def wrapper(symbol: str, basic_data: dict = None) -> Optional[Stock]:
+        key = f"stock:v{SCHEMA_VERSION}:{date.today().isoformat()}:{symbol}"
+
+        data = pending.get(key) or cache.get(key)
+        if data is not None:
+            logger.debug("Cache hit: {}", key)
+            return Stock.from_dict(data)
+
+        stock = build_stock(symbol, basic_data)
+        if stock is not None:
+            with lock:
+                pending[key] = stock.to_dict()
+                full = len(pending) >= flush_every
+            if full:
+                flush()
+
+        return stock
+
+    wrapper.flush = flush
+    return wrapper
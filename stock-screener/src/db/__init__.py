@@ -1,5 +1,5 @@
 """Database module for Supabase integration."""
 
-from .supabase_client import SupabaseClient
+from .supabase_client import SupabaseClient, get_supabase
 
-__all__ = ["SupabaseClient"]
+__all__ = ["SupabaseClient", "get_supabase"]
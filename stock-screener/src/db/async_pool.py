@@ -0,0 +1,197 @@
+"""Escrituras directas a Postgres vía asyncpg para la persistencia masiva.
+
+Se usan en lugar de PostgREST cuando DATABASE_URL apunta al Postgres del
+proyecto: los stocks de una corrida (con o sin análisis) van como un array
+tipado por columna expandido con UNNEST, en una transacción en vez de
+inserts HTTPS.
+"""
+
+import asyncio
+import atexit
+import threading
+from typing import Optional, Sequence
+
+import asyncpg
+from loguru import logger
+
+
+# (columnas, tipos Postgres, un array por columna): filas que comparten columnas
+ColumnBlock = tuple[Sequence[str], Sequence[str], Sequence[list]]
+
+# Tope de conexiones por DSN: guardados concurrentes esperan un lugar en vez
+# de abrir cada uno su conexión contra Supavisor
+POOL_MIN_SIZE = 1
+POOL_MAX_SIZE = 3
+
+# Segundos que una conexión ociosa sigue abierta antes de reciclarse
+POOL_MAX_IDLE_SECONDS = 1800
+
+# Segundos para conectar o conseguir una conexión libre del pool
+POOL_TIMEOUT = 30
+
+# Un pool de asyncpg queda atado al loop que lo creó, así que los pools viven
+# en un loop propio (thread daemon) y las llamadas bloqueantes se le despachan
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_pools: dict[str, asyncpg.Pool] = {}
+_lock = threading.Lock()
+
+
+async def create_pool(dsn: str) -> asyncpg.Pool:
+    """
+    Crea un pool acotado apto para pgbouncer/Supavisor.
+
+    Args:
+        dsn: Connection string de Postgres
+
+    Returns:
+        Pool de POOL_MIN_SIZE a POOL_MAX_SIZE conexiones sin cache de prepared
+        statements (los poolers en modo transacción no los conservan entre
+        transacciones)
+    """
+    return await asyncpg.create_pool(
+        dsn,
+        min_size=POOL_MIN_SIZE,
+        max_size=POOL_MAX_SIZE,
+        max_inactive_connection_lifetime=POOL_MAX_IDLE_SECONDS,
+        timeout=POOL_TIMEOUT,
+        statement_cache_size=0,
+    )
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Devuelve el loop de los pools, arrancando su thread la primera vez."""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-pool", daemon=True).start()
+            atexit.register(close)
+        return _loop
+
+
+async def _get_pool(dsn: str) -> asyncpg.Pool:
+    """Pool de dsn, creado en el primer uso; corre siempre en el loop de los pools."""
+    if dsn not in _pools:
+        _pools[dsn] = await create_pool(dsn)
+    return _pools[dsn]
+
+
+def close() -> None:
+    """Cierra los pools abiertos y detiene su loop."""
+    global _loop
+    with _lock:
+        loop, _loop = _loop, None
+    if loop is None:
+        return
+
+    async def _close_pools() -> None:
+        await asyncio.gather(*(pool.close() for pool in _pools.values()), return_exceptions=True)
+        _pools.clear()
+
+    asyncio.run_coroutine_threadsafe(_close_pools(), loop).result(timeout=POOL_TIMEOUT)
+    loop.call_soon_threadsafe(loop.stop)
+
+
+async def insert_run(conn: asyncpg.Connection, run_data: dict) -> str:
+    """
+    Inserta la metadata de la corrida.
+
+    Args:
+        conn: Conexión abierta
+        run_data: Columna -> valor para screener_runs
+
+    Returns:
+        UUID de la corrida creada
+    """
+    columns = ", ".join(run_data)
+    placeholders = ", ".join(f"${i}" for i in range(1, len(run_data) + 1))
+    run_id = await conn.fetchval(
+        f"INSERT INTO screener_runs ({columns}) VALUES ({placeholders}) RETURNING id",
+        *run_data.values(),
+    )
+    return str(run_id)
+
+
+async def insert_unnest(
+    conn: asyncpg.Connection,
+    table: str,
+    run_id: str,
+    columns: Sequence[str],
+    types: Sequence[str],
+    arrays: Sequence[list],
+) -> None:
+    """
+    Inserta las filas de una corrida pasando un array tipado por columna.
+
+    La sentencia es INSERT ... SELECT $1, u.* FROM UNNEST($2::text[], ...),
+    así N filas cuestan un solo parse/plan y un round trip.
+
+    Args:
+        conn: Conexión abierta
+        table: Tabla destino (con columna run_id)
+        run_id: UUID de la corrida, común a todas las filas
+        columns: Nombres de columna, en el orden de los arrays
+        types: Tipo Postgres de los elementos de cada columna (text, float8, int8...)
+        arrays: Una lista de valores por columna, todas del mismo largo
+    """
+    if not arrays or not arrays[0]:
+        return
+
+    column_list = ", ".join(columns)
+    params = ", ".join(f"${i}::{t}[]" for i, t in enumerate(types, start=2))
+    await conn.execute(
+        f"INSERT INTO {table} (run_id, {column_list}) "
+        f"SELECT $1, u.* FROM UNNEST({params}) AS u({column_list})",
+        run_id,
+        *arrays,
+    )
+
+
+async def save_run(
+    conn: asyncpg.Connection,
+    run_data: dict,
+    blocks: Sequence[ColumnBlock],
+) -> str:
+    """
+    Inserta una corrida y sus stocks en una transacción.
+
+    Args:
+        conn: Conexión abierta
+        run_data: Columna -> valor para screener_runs
+        blocks: Stocks agrupados por conjunto de columnas; un UNNEST por bloque
+
+    Returns:
+        UUID de la corrida creada
+    """
+    async with conn.transaction():
+        run_id = await insert_run(conn, run_data)
+        for columns, types, arrays in blocks:
+            await insert_unnest(conn, "stocks", run_id, columns, types, arrays)
+
+    total = sum(len(arrays[0]) for _, _, arrays in blocks if arrays)
+    logger.info(f"Insertados {total} stocks de la corrida {run_id}")
+    return run_id
+
+
+def save_run_sync(dsn: str, run_data: dict, blocks: Sequence[ColumnBlock]) -> str:
+    """
+    Versión bloqueante de save_run sobre el pool compartido de dsn.
+
+    Corre en el loop de los pools, así que también puede llamarse desde
+    código que ya está dentro de un event loop.
+
+    Args:
+        dsn: Connection string de Postgres
+        run_data: Columna -> valor para screener_runs
+        blocks: Stocks agrupados por conjunto de columnas (ver save_run)
+
+    Returns:
+        UUID de la corrida creada
+    """
+
+    async def _run() -> str:
+        pool = await _get_pool(dsn)
+        async with pool.acquire(timeout=POOL_TIMEOUT) as conn:
+            return await save_run(conn, run_data, blocks)
+
+    return asyncio.run_coroutine_threadsafe(_run(), _get_loop()).result()
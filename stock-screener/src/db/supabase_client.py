@@ -1,19 +1,199 @@
 """Supabase client for persisting screener results."""
 
+import asyncio
 import os
+from operator import attrgetter
 from typing import Optional
+
+import httpx
+import orjson
 from loguru import logger
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
 
 from src.models.stock import ScreenerResult, Stock
+from src.utils.cache import cached, get_cache
 from src.analysis.ai_scoring import AIScoreBreakdown
 from src.analysis.analyzer import StockAnalysis
 from src.analysis.price_performance import PricePerformance
 
 
+def _to_int(path: str):
+    """Getter for BIGINT columns: int value, or None when missing/zero."""
+    get = attrgetter(path)
+
+    def getter(obj):
+        value = get(obj)
+        return int(value) if value else None
+
+    return getter
+
+
+def _breakdown(key: str):
+    """Getter for a score breakdown entry."""
+    return lambda stock: (stock.score_breakdown or {}).get(key)
+
+
+# (column, getter) pairs for a basic stock row, in table order
+_STOCK_COLUMNS = (
+    ("symbol", attrgetter("symbol")),
+    ("name", attrgetter("name")),
+    ("exchange", attrgetter("exchange")),
+    ("sector", attrgetter("sector")),
+    ("industry", attrgetter("industry")),
+    ("price", attrgetter("price")),
+    ("market_cap", _to_int("market_cap")),
+    ("avg_volume", _to_int("avg_volume")),
+    # Valuation metrics
+    ("pe_ratio", attrgetter("metrics.pe_ratio")),
+    ("peg_ratio", attrgetter("metrics.peg_ratio")),
+    ("pb_ratio", attrgetter("metrics.pb_ratio")),
+    ("ps_ratio", attrgetter("metrics.ps_ratio")),
+    # Growth metrics
+    ("eps_growth_5y", attrgetter("metrics.eps_growth_5y")),
+    ("revenue_growth_5y", attrgetter("metrics.revenue_growth_5y")),
+    ("eps_growth_ttm", attrgetter("metrics.eps_growth_ttm")),
+    # Profitability metrics
+    ("roe", attrgetter("metrics.roe")),
+    ("roa", attrgetter("metrics.roa")),
+    ("gross_margin", attrgetter("metrics.gross_margin")),
+    ("operating_margin", attrgetter("metrics.operating_margin")),
+    ("net_margin", attrgetter("metrics.net_margin")),
+    # Liquidity metrics
+    ("current_ratio", attrgetter("metrics.current_ratio")),
+    ("quick_ratio", attrgetter("metrics.quick_ratio")),
+    # Solvency metrics
+    ("debt_to_equity", attrgetter("metrics.debt_to_equity")),
+    ("interest_coverage", attrgetter("metrics.interest_coverage")),
+    # Scores
+    ("score", attrgetter("score")),
+    ("score_valuation", _breakdown("score_valuation")),
+    ("score_growth", _breakdown("score_growth")),
+    ("score_profitability", _breakdown("score_profitability")),
+    ("score_financial_health", _breakdown("score_financial_health")),
+)
+
+STOCK_COLUMN_NAMES = tuple(name for name, _ in _STOCK_COLUMNS)
+
+# Postgres element types for the UNNEST insert; every other column is FLOAT
+_STOCK_TEXT_COLUMNS = {"symbol", "name", "exchange", "sector", "industry"}
+_STOCK_BIGINT_COLUMNS = {"market_cap", "avg_volume"}
+STOCK_COLUMN_TYPES = tuple(
+    "text" if name in _STOCK_TEXT_COLUMNS else "int8" if name in _STOCK_BIGINT_COLUMNS else "float8"
+    for name in STOCK_COLUMN_NAMES
+)
+
+# Stock columns also stored in analysis rows (industry comes from the analysis)
+_ANALYSIS_STOCK_COLUMNS = tuple(
+    (name, get)
+    for name, get in _STOCK_COLUMNS
+    if name in {
+        "symbol", "name", "exchange", "sector", "price", "market_cap",
+        "pe_ratio", "peg_ratio", "roe", "roa", "current_ratio", "quick_ratio",
+        "debt_to_equity", "gross_margin", "net_margin", "eps_growth_5y", "score",
+    }
+)
+
+# (column, getter) pairs read straight from StockAnalysis
+_ANALYSIS_COLUMNS = tuple(
+    (name, attrgetter(name))
+    for name in (
+        "industry", "peg_finviz", "fwd_pe",
+        # Finviz growth estimates
+        "eps_this_year", "eps_next_year",
+        # Balance
+        "revenue_ttm", "net_income_ttm", "free_cash_flow", "total_cash", "total_debt",
+    )
+)
+
+# (column, getter) pairs read straight from AIScoreBreakdown
+_AI_SCORE_COLUMNS = (
+    ("ai_score", attrgetter("total_score")),
+    ("ai_fundamental", attrgetter("fundamental_score")),
+    ("ai_valuation", attrgetter("valuation_score")),
+    ("ai_growth", attrgetter("growth_score")),
+    ("ai_momentum", attrgetter("momentum_score")),
+    ("ai_sentiment", attrgetter("sentiment_score")),
+    ("ai_quality", attrgetter("quality_score")),
+    # Analysis details
+    ("momentum_trend", attrgetter("momentum_trend")),
+    ("sentiment_summary", attrgetter("sentiment_summary")),
+    ("growth_outlook", attrgetter("growth_outlook")),
+    ("valuation_vs_sector", attrgetter("valuation_vs_sector")),
+)
+
+
+# Postgres element types for UNNEST inserts of any stocks column. Analysis
+# REAL/BIGINT columns travel as float8 (their values may be floats or ints);
+# Postgres assignment-casts them to the column type on insert.
+_COLUMN_TYPES = {
+    **dict(zip(STOCK_COLUMN_NAMES, STOCK_COLUMN_TYPES)),
+    **{name: "float8" for name, _ in _ANALYSIS_COLUMNS if name != "industry"},
+    **{name: "float8" for name, _ in _AI_SCORE_COLUMNS if name.startswith("ai_")},
+    **{name: "float8" for name in ("perf_1d", "perf_1w", "perf_1m", "perf_ytd", "perf_52w")},
+    **{name: "text" for name in (
+        "momentum_trend", "sentiment_summary", "growth_outlook", "valuation_vs_sector",
+        "next_earnings_date", "trade_idea",
+    )},
+    **{name: "jsonb" for name in ("flags", "news", "related_assets")},
+}
+
+
+def _event_loop_running() -> bool:
+    """Whether the calling thread is inside a running asyncio event loop."""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def _group_by_columns(rows: list[dict]) -> dict[tuple[str, ...], list[dict]]:
+    """Group row dictionaries by their column set, keeping insertion order."""
+    groups: dict[tuple[str, ...], list[dict]] = {}
+    for row in rows:
+        groups.setdefault(tuple(row), []).append(row)
+    return groups
+
+
+def _unnest_blocks(rows: list[dict]) -> list[tuple[tuple[str, ...], tuple[str, ...], list[list]]]:
+    """Turn stock rows into (columns, types, arrays) blocks for async_pool.save_run.
+
+    run_id is dropped (save_run binds it once) and JSONB values are encoded,
+    since asyncpg expects JSON text for jsonb parameters.
+
+    Args:
+        rows: Row dictionaries, as built by _stock_to_dict/_analysis_to_dict.
+
+    Returns:
+        One block per column set, with one value list per column.
+    """
+    blocks = []
+    for columns, group in _group_by_columns(rows).items():
+        columns = tuple(c for c in columns if c != "run_id")
+        types = tuple(_COLUMN_TYPES[c] for c in columns)
+        arrays = []
+        for column, pg_type in zip(columns, types):
+            values = [row[column] for row in group]
+            if pg_type == "jsonb":
+                values = [None if v is None else orjson.dumps(v, default=str).decode() for v in values]
+            arrays.append(values)
+        blocks.append((columns, types, arrays))
+    return blocks
+
+
+# Seconds the dashboard read queries are served from the local cache
+READ_CACHE_TTL_SECONDS = 60
+
+
 class SupabaseClient:
     """Client for interacting with Supabase database."""
 
+    # Rows per insert request; keeps payloads well under PostgREST's body limit
+    INSERT_BATCH_SIZE = 1000
+
+    # Seconds before a PostgREST/Storage request is abandoned
+    REQUEST_TIMEOUT = 30
+
     def __init__(self, url: Optional[str] = None, key: Optional[str] = None):
         """Initialize Supabase client.
 
@@ -30,7 +210,14 @@ class SupabaseClient:
                 "or passed as arguments"
             )
 
-        self.client: Client = create_client(self.url, self.key)
+        self.client: Client = create_client(
+            self.url,
+            self.key,
+            options=ClientOptions(
+                postgrest_client_timeout=self.REQUEST_TIMEOUT,
+                storage_client_timeout=self.REQUEST_TIMEOUT,
+            ),
+        )
         logger.info("Supabase client initialized")
 
     def save_run(self, result: ScreenerResult) -> str:
@@ -53,25 +240,104 @@ class SupabaseClient:
             "errors": result.errors if result.errors else None,
         }
 
+        # Direct Postgres endpoint available: insert run + UNNEST stocks in one transaction
+        database_url = os.getenv("DATABASE_URL")
+        if database_url:
+            from src.db import async_pool  # asyncpg is only needed on this path
+
+            run_id = async_pool.save_run_sync(
+                database_url,
+                run_data,
+                [(STOCK_COLUMN_NAMES, STOCK_COLUMN_TYPES, self._stock_columns(result.stocks))],
+            )
+            self.invalidate_read_cache()
+            return run_id
+
         run_response = self.client.table("screener_runs").insert(run_data).execute()
         run_id = run_response.data[0]["id"]
         logger.info(f"Created screener run with id: {run_id}")
 
-        # 2. Insert stocks in batches
+        # 2. Bulk insert stocks
         if result.stocks:
             stocks_data = [self._stock_to_dict(stock, run_id) for stock in result.stocks]
-
-            # Supabase can handle batches, but let's be safe with chunks of 100
-            batch_size = 100
-            for i in range(0, len(stocks_data), batch_size):
-                batch = stocks_data[i : i + batch_size]
-                self.client.table("stocks").insert(batch).execute()
-                logger.debug(f"Inserted batch {i // batch_size + 1} of stocks")
-
+            self._insert_rows("stocks", stocks_data)
             logger.info(f"Saved {len(result.stocks)} stocks to database")
 
+        self.invalidate_read_cache()
         return run_id
 
+    def invalidate_read_cache(self) -> None:
+        """Drop cached dashboard reads so the next call sees the latest writes."""
+        cache = get_cache()
+        for read in (self.get_latest_run, self.get_latest_stocks, self.get_run_history):
+            read.reset_missing()
+        for prefix in ("latest_run", "latest_stocks", "run_history"):
+            cache.delete_prefix(prefix)
+
+    def _insert_rows(self, table: str, rows: list[dict]) -> None:
+        """Insert rows with as few requests as possible.
+
+        PostgREST needs every row of a multi-row INSERT to share the same
+        columns, so rows are grouped by column set. A single group goes out
+        as plain bulk inserts; several groups are sent concurrently, unless
+        the caller is already inside an event loop (asyncio.run would fail
+        there), in which case they are inserted one after another.
+
+        Args:
+            table: Target table name.
+            rows: Row dictionaries to insert.
+        """
+        groups = _group_by_columns(rows)
+
+        batch_size = self.INSERT_BATCH_SIZE
+        batches = [
+            group[i : i + batch_size]
+            for group in groups.values()
+            for i in range(0, len(group), batch_size)
+        ]
+
+        if len(groups) == 1 or _event_loop_running():
+            for n, batch in enumerate(batches, 1):
+                self.client.table(table).insert(batch).execute()
+                logger.debug(f"Inserted batch {n} into {table}")
+        else:
+            asyncio.run(self._insert_batches_async(table, batches))
+
+    async def _insert_batches_async(self, table: str, batches: list[list[dict]]) -> None:
+        """POST several insert batches to PostgREST concurrently.
+
+        Args:
+            table: Target table name.
+            batches: Row batches; rows within a batch share the same columns.
+
+        Raises:
+            Exception: The first failed insert, after all batches have finished.
+        """
+        headers = {
+            "apikey": self.key,
+            "Authorization": f"Bearer {self.key}",
+            "Prefer": "return=minimal",
+        }
+        limits = httpx.Limits(max_connections=20, max_keepalive_connections=20)
+
+        async with httpx.AsyncClient(
+            base_url=f"{self.url}/rest/v1",
+            headers=headers,
+            limits=limits,
+            timeout=self.REQUEST_TIMEOUT,
+        ) as session:
+
+            async def post(batch: list[dict]) -> None:
+                response = await session.post(f"/{table}", json=batch)
+                response.raise_for_status()
+
+            results = await asyncio.gather(*(post(b) for b in batches), return_exceptions=True)
+
+        errors = [r for r in results if isinstance(r, Exception)]
+        logger.debug(f"Inserted {len(batches) - len(errors)}/{len(batches)} batches into {table}")
+        if errors:
+            raise errors[0]
+
     def _stock_to_dict(self, stock: Stock, run_id: str) -> dict:
         """Convert Stock object to database row dictionary.
 
@@ -82,48 +348,22 @@ class SupabaseClient:
         Returns:
             Dictionary ready for database insertion.
         """
-        metrics = stock.metrics
-        breakdown = stock.score_breakdown or {}
-
-        return {
-            "run_id": run_id,
-            "symbol": stock.symbol,
-            "name": stock.name,
-            "exchange": stock.exchange,
-            "sector": stock.sector,
-            "industry": stock.industry,
-            "price": stock.price,
-            "market_cap": int(stock.market_cap) if stock.market_cap else None,
-            "avg_volume": int(stock.avg_volume) if stock.avg_volume else None,
-            # Valuation metrics
-            "pe_ratio": metrics.pe_ratio,
-            "peg_ratio": metrics.peg_ratio,
-            "pb_ratio": metrics.pb_ratio,
-            "ps_ratio": metrics.ps_ratio,
-            # Growth metrics
-            "eps_growth_5y": metrics.eps_growth_5y,
-            "revenue_growth_5y": metrics.revenue_growth_5y,
-            "eps_growth_ttm": metrics.eps_growth_ttm,
-            # Profitability metrics
-            "roe": metrics.roe,
-            "roa": metrics.roa,
-            "gross_margin": metrics.gross_margin,
-            "operating_margin": metrics.operating_margin,
-            "net_margin": metrics.net_margin,
-            # Liquidity metrics
-            "current_ratio": metrics.current_ratio,
-            "quick_ratio": metrics.quick_ratio,
-            # Solvency metrics
-            "debt_to_equity": metrics.debt_to_equity,
-            "interest_coverage": metrics.interest_coverage,
-            # Scores
-            "score": stock.score,
-            "score_valuation": breakdown.get("score_valuation"),
-            "score_growth": breakdown.get("score_growth"),
-            "score_profitability": breakdown.get("score_profitability"),
-            "score_financial_health": breakdown.get("score_financial_health"),
-        }
+        row = {"run_id": run_id}
+        row.update({name: get(stock) for name, get in _STOCK_COLUMNS})
+        return row
+
+    def _stock_columns(self, stocks: list[Stock]) -> list[list]:
+        """Convert Stock objects to one value list per column (for UNNEST).
 
+        Args:
+            stocks: Stock objects to convert.
+
+        Returns:
+            Lists in STOCK_COLUMN_NAMES order, one entry per stock.
+        """
+        return [[get(stock) for stock in stocks] for _, get in _STOCK_COLUMNS]
+
+    @cached("latest_run", ttl_seconds=READ_CACHE_TTL_SECONDS)
     def get_latest_run(self) -> Optional[dict]:
         """Get the most recent screener run metadata.
 
@@ -139,6 +379,7 @@ class SupabaseClient:
         )
         return response.data[0] if response.data else None
 
+    @cached("latest_stocks", ttl_seconds=READ_CACHE_TTL_SECONDS)
     def get_latest_stocks(self, limit: int = 100) -> list[dict]:
         """Get stocks from the most recent screener run.
 
@@ -157,6 +398,7 @@ class SupabaseClient:
         )
         return response.data
 
+    @cached("run_history", ttl_seconds=READ_CACHE_TTL_SECONDS)
     def get_run_history(self, limit: int = 30) -> list[dict]:
         """Get history of screener runs.
 
@@ -217,97 +459,45 @@ class SupabaseClient:
     def delete_old_runs(self, keep_count: int = 30) -> int:
         """Delete old screener runs, keeping the most recent ones.
 
+        Runs server-side through the delete_old_runs RPC
+        (database/migrations/006_delete_old_runs.sql).
+
         Args:
             keep_count: Number of recent runs to keep.
 
         Returns:
             Number of runs deleted.
         """
-        # Get IDs of runs to keep
-        keep_response = (
-            self.client.table("screener_runs")
-            .select("id")
-            .order("created_at", desc=True)
-            .limit(keep_count)
-            .execute()
-        )
-        keep_ids = [r["id"] for r in keep_response.data]
-
-        if not keep_ids:
-            return 0
-
-        # Delete runs not in keep list
         # Note: This cascades to delete associated stocks due to ON DELETE CASCADE
-        delete_response = (
-            self.client.table("screener_runs")
-            .delete()
-            .not_.in_("id", keep_ids)
-            .execute()
-        )
+        response = self.client.rpc("delete_old_runs", {"keep_count": keep_count}).execute()
+        deleted_count = response.data or 0
+        self.invalidate_read_cache()
 
-        deleted_count = len(delete_response.data) if delete_response.data else 0
         logger.info(f"Deleted {deleted_count} old screener runs")
         return deleted_count
 
     def cleanup_keep_one_per_day(self, keep_days: int = 30) -> int:
         """Delete duplicate runs keeping only the latest run per day.
 
+        Runs server-side through the cleanup_keep_one_per_day RPC
+        (database/migrations/005_cleanup_keep_one_per_day.sql).
+
         Args:
             keep_days: Number of days of history to keep.
 
         Returns:
             Number of runs deleted.
         """
-        from datetime import datetime, timedelta
-        from collections import defaultdict
+        response = self.client.rpc(
+            "cleanup_keep_one_per_day", {"keep_days": keep_days}
+        ).execute()
+        deleted = response.data or 0
+        self.invalidate_read_cache()
 
-        # Get all runs
-        response = (
-            self.client.table("screener_runs")
-            .select("id, created_at")
-            .order("created_at", desc=True)
-            .execute()
-        )
-
-        if not response.data:
-            return 0
-
-        # Group runs by date
-        runs_by_date = defaultdict(list)
-        for run in response.data:
-            # Parse date (assuming ISO format)
-            created = run["created_at"][:10]  # YYYY-MM-DD
-            runs_by_date[created].append(run["id"])
-
-        # Identify runs to delete (keep only first/latest per day)
-        ids_to_delete = []
-        cutoff_date = (datetime.now() - timedelta(days=keep_days)).strftime("%Y-%m-%d")
-
-        for date, run_ids in runs_by_date.items():
-            # Delete runs older than keep_days
-            if date < cutoff_date:
-                ids_to_delete.extend(run_ids)
-            # Keep only the first (latest) run per day
-            elif len(run_ids) > 1:
-                ids_to_delete.extend(run_ids[1:])  # Keep first, delete rest
-
-        if not ids_to_delete:
+        if not deleted:
             logger.info("No duplicate runs to clean up")
             return 0
 
-        # Delete in batches
-        deleted = 0
-        batch_size = 50
-        for i in range(0, len(ids_to_delete), batch_size):
-            batch = ids_to_delete[i:i + batch_size]
-            delete_response = (
-                self.client.table("screener_runs")
-                .delete()
-                .in_("id", batch)
-                .execute()
-            )
-            deleted += len(delete_response.data) if delete_response.data else 0
-
         logger.info(f"Cleaned up {deleted} duplicate runs, keeping 1 per day")
         return deleted
 
@@ -330,51 +520,39 @@ class SupabaseClient:
             trade_idea_md: Trade idea in markdown format.
             price_perf: Price performance data (1D, 1W, 1M, YTD, 52W).
         """
-        data = {
-            "run_id": run_id,
-            "symbol": stock.symbol,
-            "name": stock.name,
-            "exchange": stock.exchange,
-            "sector": stock.sector,
-            "industry": analysis.industry,
-            "price": stock.price,
-            "market_cap": int(stock.market_cap) if stock.market_cap else None,
-            # Basic metrics
-            "pe_ratio": stock.metrics.pe_ratio,
-            "peg_ratio": stock.metrics.peg_ratio,
-            "peg_finviz": analysis.peg_finviz,
-            "fwd_pe": analysis.fwd_pe,
-            "roe": stock.metrics.roe,
-            "roa": stock.metrics.roa,
-            "current_ratio": stock.metrics.current_ratio,
-            "quick_ratio": stock.metrics.quick_ratio,
-            "debt_to_equity": stock.metrics.debt_to_equity,
-            "gross_margin": stock.metrics.gross_margin,
-            "net_margin": stock.metrics.net_margin,
-            "eps_growth_5y": stock.metrics.eps_growth_5y,
-            # Finviz growth estimates
-            "eps_this_year": analysis.eps_this_year,
-            "eps_next_year": analysis.eps_next_year,
-            # Balance
-            "revenue_ttm": analysis.revenue_ttm,
-            "net_income_ttm": analysis.net_income_ttm,
-            "free_cash_flow": analysis.free_cash_flow,
-            "total_cash": analysis.total_cash,
-            "total_debt": analysis.total_debt,
-            # AI Score
-            "score": stock.score,
-            "ai_score": ai_score.total_score,
-            "ai_fundamental": ai_score.fundamental_score,
-            "ai_valuation": ai_score.valuation_score,
-            "ai_growth": ai_score.growth_score,
-            "ai_momentum": ai_score.momentum_score,
-            "ai_sentiment": ai_score.sentiment_score,
-            "ai_quality": ai_score.quality_score,
-            # Analysis details
-            "momentum_trend": ai_score.momentum_trend,
-            "sentiment_summary": ai_score.sentiment_summary,
-            "growth_outlook": ai_score.growth_outlook,
-            "valuation_vs_sector": ai_score.valuation_vs_sector,
+        data = self._analysis_to_dict(run_id, stock, analysis, ai_score, trade_idea_md, price_perf)
+
+        # Insert stock analysis
+        self.client.table("stocks").insert(data).execute()
+        logger.debug(f"Saved analysis for {stock.symbol}")
+
+    def _analysis_to_dict(
+        self,
+        run_id: str,
+        stock: Stock,
+        analysis: StockAnalysis,
+        ai_score: AIScoreBreakdown,
+        trade_idea_md: str,
+        price_perf: Optional[PricePerformance] = None,
+    ) -> dict:
+        """Convert a stock and its full analysis to a database row dictionary.
+
+        Args:
+            run_id: UUID of the parent screener run.
+            stock: Stock object.
+            analysis: Complete analysis.
+            ai_score: AI score breakdown.
+            trade_idea_md: Trade idea in markdown format.
+            price_perf: Price performance data (1D, 1W, 1M, YTD, 52W).
+
+        Returns:
+            Dictionary ready for database insertion.
+        """
+        row = {"run_id": run_id}
+        row.update({name: get(stock) for name, get in _ANALYSIS_STOCK_COLUMNS})
+        row.update({name: get(analysis) for name, get in _ANALYSIS_COLUMNS})
+        row.update({name: get(ai_score) for name, get in _AI_SCORE_COLUMNS})
+        row.update({
             # Flags and news
             "flags": ai_score.flags if ai_score.flags else None,
             "news": [{"title": n.title, "date": n.date, "source": n.source} for n in analysis.news[:5]] if analysis.news else None,
@@ -392,11 +570,31 @@ class SupabaseClient:
             "perf_1m": price_perf.perf_1m if price_perf else None,
             "perf_ytd": price_perf.perf_ytd if price_perf else None,
             "perf_52w": price_perf.perf_52w if price_perf else None,
-        }
+        })
+        return row
 
-        # Insert stock analysis
-        self.client.table("stocks").insert(data).execute()
-        logger.debug(f"Saved analysis for {stock.symbol}")
+    def _analysis_rows(
+        self,
+        result: ScreenerResult,
+        analyses: dict[str, tuple[StockAnalysis, AIScoreBreakdown, str, Optional[PricePerformance]]],
+        run_id: str,
+    ) -> list[dict]:
+        """Build the stock rows of a run, using the full analysis when available.
+
+        Args:
+            result: ScreenerResult with the stocks.
+            analyses: Dict mapping symbol to (analysis, ai_score, trade_idea_md, price_perf).
+            run_id: UUID of the parent screener run.
+
+        Returns:
+            One row dictionary per stock.
+        """
+        return [
+            self._analysis_to_dict(run_id, stock, *analyses[stock.symbol])
+            if stock.symbol in analyses
+            else self._stock_to_dict(stock, run_id)
+            for stock in result.stocks
+        ]
 
     def save_run_with_analysis(
         self,
@@ -423,20 +621,43 @@ class SupabaseClient:
             "errors": result.errors if result.errors else None,
         }
 
+        # Direct Postgres endpoint available: insert run + UNNEST stocks in one transaction
+        database_url = os.getenv("DATABASE_URL")
+        if database_url:
+            from src.db import async_pool  # asyncpg is only needed on this path
+
+            run_id = async_pool.save_run_sync(
+                database_url,
+                run_data,
+                _unnest_blocks(self._analysis_rows(result, analyses, None)),
+            )
+            self.invalidate_read_cache()
+            return run_id
+
         run_response = self.client.table("screener_runs").insert(run_data).execute()
         run_id = run_response.data[0]["id"]
         logger.info(f"Created screener run: {run_id}")
 
-        # 2. Save stocks with analysis
-        for stock in result.stocks:
-            if stock.symbol in analyses:
-                analysis, ai_score, trade_idea, price_perf = analyses[stock.symbol]
-                self.save_stock_analysis(run_id, stock, analysis, ai_score, trade_idea, price_perf)
-            else:
-                # Fallback: save basic data
-                self.client.table("stocks").insert(
-                    self._stock_to_dict(stock, run_id)
-                ).execute()
+        # 2. Bulk insert stocks with analysis (fallback: basic data)
+        rows = self._analysis_rows(result, analyses, run_id)
+        if rows:
+            self._insert_rows("stocks", rows)
 
         logger.info(f"Saved {len(result.stocks)} stocks with analysis")
+        self.invalidate_read_cache()
         return run_id
+
+
+_default_supabase: Optional[SupabaseClient] = None
+
+
+def get_supabase() -> SupabaseClient:
+    """Get the shared Supabase client.
+
+    The client keeps its HTTP session (and TLS connections) alive, so callers
+    should use this instead of constructing SupabaseClient per operation.
+    """
+    global _default_supabase
+    if _default_supabase is None:
+        _default_supabase = SupabaseClient()
+    return _default_supabase
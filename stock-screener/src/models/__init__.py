@@ -1,5 +1,5 @@
 """Modelos de datos."""
 
-from src.models.stock import Stock, StockMetrics, ScreenerResult
+from src.models.stock import Stock, StockMetrics, StockUniverse, ScreenerResult
 
-__all__ = ["Stock", "StockMetrics", "ScreenerResult"]
+__all__ = ["Stock", "StockMetrics", "StockUniverse", "ScreenerResult"]
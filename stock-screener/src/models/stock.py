@@ -1,11 +1,26 @@
 """Modelos de datos para el screener."""
 
-from dataclasses import dataclass, field
+import sys
+from dataclasses import dataclass, field, fields
 from datetime import datetime
-from typing import Optional
+from operator import attrgetter
+from typing import Callable, Optional
 
+import numpy as np
+import orjson
 
-@dataclass
+
+def intern_label(value: Optional[str]) -> Optional[str]:
+    """
+    Interna etiquetas de vocabulario cerrado (sector, industria).
+
+    Con las cadenas internadas, las búsquedas en los frozensets de
+    exclusión resuelven por identidad sin comparar caracteres.
+    """
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+@dataclass(slots=True)
 class StockMetrics:
     """Métricas financieras de una acción."""
     
@@ -37,10 +52,61 @@ class StockMetrics:
     
     def to_dict(self) -> dict:
         """Convierte a diccionario excluyendo valores None."""
-        return {k: v for k, v in self.__dict__.items() if v is not None}
+        return {f: v for f in METRIC_FIELDS if (v := getattr(self, f)) is not None}
+
+
+# Nombres de los campos de StockMetrics, en orden de declaración
+METRIC_FIELDS: tuple[str, ...] = tuple(f.name for f in fields(StockMetrics))
+
+
+# (getter, min, max) por criterio; None = sin límite
+CompiledCriteria = list[tuple[Callable[[StockMetrics], Optional[float]], Optional[float], Optional[float]]]
+
+
+def compile_criteria(criteria: dict) -> CompiledCriteria:
+    """
+    Precompila criterios {métrica: {"min": x, "max": y}} para evaluarlos en loop.
+
+    Las métricas que StockMetrics no tiene se descartan (nunca filtran).
+
+    Args:
+        criteria: Criterios por métrica
 
+    Returns:
+        Lista de (getter, min, max) para passes_compiled
+    """
+    return [
+        (attrgetter(key), bounds.get("min"), bounds.get("max"))
+        for key, bounds in criteria.items()
+        if key in METRIC_FIELDS
+    ]
 
-@dataclass
+
+def passes_compiled(metrics: StockMetrics, compiled: CompiledCriteria) -> bool:
+    """
+    Evalúa métricas contra criterios precompilados.
+
+    Un dato faltante (None) no descarta.
+
+    Args:
+        metrics: Métricas a evaluar
+        compiled: Resultado de compile_criteria
+
+    Returns:
+        True si cumple todos los límites
+    """
+    for get, lo, hi in compiled:
+        value = get(metrics)
+        if value is None:
+            continue
+        if lo is not None and value < lo:
+            return False
+        if hi is not None and value > hi:
+            return False
+    return True
+
+
+@dataclass(slots=True)
 class Stock:
     """Representa una acción con sus datos y métricas."""
     
@@ -67,17 +133,33 @@ class Stock:
     data_source: str = "fmp"
     
     def passes_filter(self, criteria: dict) -> bool:
-        """Verifica si pasa un criterio específico."""
-        for key, bounds in criteria.items():
-            value = getattr(self.metrics, key, None)
-            if value is None:
-                continue
-            if bounds.get("min") is not None and value < bounds["min"]:
-                return False
-            if bounds.get("max") is not None and value > bounds["max"]:
-                return False
-        return True
+        """
+        Verifica si pasa un criterio específico.
+
+        Para evaluar muchos stocks con los mismos criterios, compilarlos una
+        vez con compile_criteria y usar passes_compiled.
+        """
+        return passes_compiled(self.metrics, compile_criteria(criteria))
     
+    @classmethod
+    def from_dict(cls, data: dict) -> "Stock":
+        """Reconstruye un Stock desde el formato de to_dict()."""
+        return cls(
+            symbol=data["symbol"],
+            name=data["name"],
+            exchange=data["exchange"],
+            sector=intern_label(data["sector"]),
+            industry=intern_label(data["industry"]),
+            price=data["price"],
+            market_cap=data["market_cap"],
+            avg_volume=data["avg_volume"],
+            metrics=StockMetrics(**data.get("metrics", {})),
+            score=data.get("score"),
+            score_breakdown=data.get("score_breakdown", {}),
+            last_updated=datetime.fromisoformat(data["last_updated"]),
+            data_source=data.get("data_source", "fmp"),
+        )
+
     def to_dict(self) -> dict:
         """Serializa a diccionario."""
         return {
@@ -97,7 +179,98 @@ class Stock:
         }
 
 
-@dataclass
+@dataclass(slots=True)
+class StockUniverse:
+    """
+    Vista columnar (SoA) de una lista de stocks.
+
+    Cada métrica numérica es un array float32 (NaN = dato faltante), así los
+    filtros se evalúan con comparaciones vectorizadas sobre todo el universo
+    y solo se materializan como Stock las filas que pasan. float32 alcanza
+    para ratios y márgenes (~7 dígitos) y reduce a la mitad los bytes por
+    comparación; los límites se comparan en float32 también, así que un
+    valor a menos de ~1e-7 relativo del límite cuenta como igual a él.
+    """
+
+    symbols: np.ndarray
+    columns: dict[str, np.ndarray]
+    stocks: list[Stock]
+
+    # Columnas de mercado además de las métricas de StockMetrics
+    MARKET_FIELDS = ("price", "market_cap", "avg_volume")
+
+    METRIC_DTYPE = np.float32
+
+    @classmethod
+    def from_stocks(cls, stocks: list[Stock]) -> "StockUniverse":
+        """
+        Construye el universo columnar desde una lista de stocks.
+
+        Args:
+            stocks: Stocks a convertir
+
+        Returns:
+            StockUniverse con una columna por métrica
+        """
+        # Datos de mercado: precio en float64, montos enteros (faltante -> 0)
+        columns = {
+            "price": np.array([s.price for s in stocks], dtype=np.float64),
+            "market_cap": np.array([s.market_cap or 0 for s in stocks], dtype=np.int64),
+            "avg_volume": np.array([s.avg_volume or 0 for s in stocks], dtype=np.int64),
+        }
+        for name in METRIC_FIELDS:
+            columns[name] = np.array(
+                [getattr(s.metrics, name) for s in stocks], dtype=cls.METRIC_DTYPE
+            )
+
+        symbols = np.array([s.symbol for s in stocks], dtype=object)
+        return cls(symbols=symbols, columns=columns, stocks=list(stocks))
+
+    def __len__(self) -> int:
+        return len(self.stocks)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """Devuelve la columna de una métrica."""
+        return self.columns[name]
+
+    def passes_filter_batch(self, criteria: dict) -> np.ndarray:
+        """
+        Versión vectorizada de Stock.passes_filter sobre todo el universo.
+
+        Args:
+            criteria: Criterios {métrica: {"min": x, "max": y}}
+
+        Returns:
+            Máscara bool con True para los stocks que cumplen todos los límites
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for key, bounds in criteria.items():
+            col = self.columns.get(key)
+            if col is None or key in self.MARKET_FIELDS:
+                continue
+            missing = np.isnan(col)
+            if bounds.get("min") is not None:
+                mask &= (col >= bounds["min"]) | missing
+            if bounds.get("max") is not None:
+                mask &= (col <= bounds["max"]) | missing
+        return mask
+
+    def to_stocks(self, mask: Optional[np.ndarray] = None) -> list[Stock]:
+        """
+        Materializa los stocks seleccionados.
+
+        Args:
+            mask: Máscara bool (None = todos)
+
+        Returns:
+            Los Stock originales de las filas seleccionadas, en orden
+        """
+        if mask is None:
+            return list(self.stocks)
+        return [self.stocks[i] for i in np.flatnonzero(mask)]
+
+
+@dataclass(slots=True)
 class ScreenerResult:
     """Resultado de una ejecución del screener."""
     
@@ -120,3 +293,7 @@ class ScreenerResult:
             "execution_time_seconds": self.execution_time_seconds,
             "errors": self.errors,
         }
+
+    def to_json_bytes(self) -> bytes:
+        """Serializa a JSON (UTF-8) con orjson, mismo contenido que to_dict()."""
+        return orjson.dumps(self.to_dict())
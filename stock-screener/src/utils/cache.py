@@ -1,24 +1,61 @@
 """Sistema de cache para reducir llamadas a APIs."""
 
-import json
+import functools
+import hashlib
+import inspect
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
 from pathlib import Path
 from datetime import datetime, timedelta
-from typing import Optional, Any
+from typing import Any, Iterable, Optional
 
+import orjson
 from loguru import logger
 
 
+# Versión del esquema de la tabla cache (PRAGMA user_version).
+# Al cambiarla, las tablas viejas se descartan al abrir: es solo cache.
+CACHE_SCHEMA_VERSION = 3
+
+_ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+# Upsert en lugar de INSERT OR REPLACE: el REPLACE borra la fila sin disparar
+# el trigger de DELETE y cache_stats contaría la key dos veces
+_UPSERT_SQL = """
+    INSERT INTO cache (key, value, created_at, expires_at_unix, source)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(key) DO UPDATE SET
+        value = excluded.value,
+        created_at = excluded.created_at,
+        expires_at_unix = excluded.expires_at_unix,
+        source = excluded.source
+"""
+
+
 class CacheManager:
     """
     Manager de cache usando SQLite.
     Almacena respuestas de API con TTL configurable.
+
+    Mantiene una única conexión (WAL, autocommit) compartida entre threads
+    y serializada con un lock, en lugar de abrir el archivo en cada operación.
+
+    Delante de SQLite hay un LRU en memoria con los valores ya decodificados:
+    las claves repetidas dentro de una corrida no vuelven a leer ni parsear.
+    Los valores devueltos son compartidos, no deben mutarse.
+
+    Las expiraciones se guardan como timestamp unix entero (indexado) y la
+    tabla cache_stats lleva el conteo por source vía triggers, así stats()
+    no recorre la tabla completa.
     """
     
     def __init__(
         self,
         db_path: str = "data/cache.db",
         default_ttl_hours: int = 24,
+        mem_max_entries: int = 2048,
     ):
         """
         Inicializa el cache.
@@ -26,28 +63,85 @@ class CacheManager:
         Args:
             db_path: Ruta a la base de datos SQLite
             default_ttl_hours: TTL default en horas
+            mem_max_entries: Máximo de entradas en el LRU en memoria
         """
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self.default_ttl = timedelta(hours=default_ttl_hours)
-        
+
+        # key -> (valor decodificado, expiración unix), en orden de uso
+        self._mem: OrderedDict[str, tuple[Any, int]] = OrderedDict()
+        self._mem_max = mem_max_entries
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA temp_store=MEMORY")
+        self._conn.execute("PRAGMA mmap_size=268435456")
+
         self._init_db()
     
     def _init_db(self):
         """Inicializa la base de datos."""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._lock:
+            conn = self._conn
+
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != CACHE_SCHEMA_VERSION:
+                # v1 guardaba JSON como TEXT y v2 expiraciones ISO: se descarta
+                # en lugar de migrar
+                conn.execute("DROP TABLE IF EXISTS cache")
+                conn.execute("DROP TABLE IF EXISTS cache_stats")
+                conn.execute(f"PRAGMA user_version = {CACHE_SCHEMA_VERSION}")
+
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS cache (
                     key TEXT PRIMARY KEY,
-                    value TEXT NOT NULL,
+                    value BLOB NOT NULL,
                     created_at TIMESTAMP NOT NULL,
-                    expires_at TIMESTAMP NOT NULL,
+                    expires_at_unix INTEGER NOT NULL,
                     source TEXT
                 )
             """)
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_expires 
-                ON cache(expires_at)
+                CREATE INDEX IF NOT EXISTS idx_exp_unix
+                ON cache(expires_at_unix)
+            """)
+
+            # Conteo por source, mantenido por triggers en cada escritura
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache_stats (
+                    source TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS cache_stats_insert
+                AFTER INSERT ON cache
+                BEGIN
+                    INSERT INTO cache_stats (source, count) VALUES (NEW.source, 1)
+                    ON CONFLICT(source) DO UPDATE SET count = count + 1;
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS cache_stats_delete
+                AFTER DELETE ON cache
+                BEGIN
+                    UPDATE cache_stats SET count = count - 1 WHERE source = OLD.source;
+                END
+            """)
+            conn.execute("""
+                CREATE TRIGGER IF NOT EXISTS cache_stats_update
+                AFTER UPDATE OF source ON cache
+                WHEN OLD.source IS NOT NEW.source
+                BEGIN
+                    UPDATE cache_stats SET count = count - 1 WHERE source = OLD.source;
+                    INSERT INTO cache_stats (source, count) VALUES (NEW.source, 1)
+                    ON CONFLICT(source) DO UPDATE SET count = count + 1;
+                END
             """)
     
     def get(self, key: str) -> Optional[Any]:
@@ -60,25 +154,36 @@ class CacheManager:
         Returns:
             Valor deserializado o None si no existe/expiró
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute(
-                "SELECT value, expires_at FROM cache WHERE key = ?",
-                (key,)
-            )
-            row = cursor.fetchone()
+        with self._lock:
+            now = int(time.time())
+
+            entry = self._mem.get(key)
+            if entry is not None:
+                value, expires = entry
+                if expires > now:
+                    self._mem.move_to_end(key)
+                    return value
+                del self._mem[key]
+
+            # Las entradas expiradas quedan hasta cleanup_expired()
+            row = self._conn.execute(
+                "SELECT value, expires_at_unix FROM cache WHERE key = ? AND expires_at_unix > ?",
+                (key, now)
+            ).fetchone()
             
             if not row:
                 return None
             
-            value, expires_at = row
-            expires = datetime.fromisoformat(expires_at)
-            
-            if datetime.now() > expires:
-                # Expirado, eliminar
-                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
-                return None
-            
-            return json.loads(value)
+            value = orjson.loads(row[0])
+            self._remember(key, value, row[1])
+            return value
+
+    def _remember(self, key: str, value: Any, expires: int):
+        """Guarda un valor decodificado en el LRU, desalojando el más viejo."""
+        self._mem[key] = (value, expires)
+        self._mem.move_to_end(key)
+        if len(self._mem) > self._mem_max:
+            self._mem.popitem(last=False)
     
     def set(
         self,
@@ -92,29 +197,93 @@ class CacheManager:
         
         Args:
             key: Clave del cache
-            value: Valor a guardar (debe ser serializable a JSON)
+            value: Valor a guardar (serializable con orjson; acepta arrays numpy)
             ttl: Time-to-live (usa default si no se especifica)
             source: Fuente del dato (para debugging)
         """
         ttl = ttl or self.default_ttl
         now = datetime.now()
-        expires = now + ttl
         
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                INSERT OR REPLACE INTO cache (key, value, created_at, expires_at, source)
-                VALUES (?, ?, ?, ?, ?)
-            """, (key, json.dumps(value), now.isoformat(), expires.isoformat(), source))
+        with self._lock:
+            # Se invalida: el próximo get lee la versión serializada
+            self._mem.pop(key, None)
+            self._conn.execute(_UPSERT_SQL, (
+                key,
+                orjson.dumps(value, option=_ORJSON_OPTIONS),
+                now.isoformat(),
+                int(now.timestamp() + ttl.total_seconds()),
+                source,
+            ))
     
+    def set_many(self, items: Iterable[tuple[str, Any, Optional[timedelta], str]]):
+        """
+        Guarda varios valores en una sola transacción (un único commit).
+
+        Args:
+            items: Tuplas (key, value, ttl, source); ttl None usa el default
+        """
+        now = datetime.now()
+        created = now.isoformat()
+        now_unix = now.timestamp()
+        rows = [
+            (
+                key,
+                orjson.dumps(value, option=_ORJSON_OPTIONS),
+                created,
+                int(now_unix + (ttl or self.default_ttl).total_seconds()),
+                source,
+            )
+            for key, value, ttl, source in items
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            for row in rows:
+                self._mem.pop(row[0], None)
+
+            conn = self._conn
+            conn.execute("BEGIN")
+            try:
+                conn.executemany(_UPSERT_SQL, rows)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
     def delete(self, key: str):
         """Elimina entrada del cache."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+        with self._lock:
+            self._mem.pop(key, None)
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
     
+    def delete_prefix(self, prefix: str) -> int:
+        """
+        Elimina todas las entradas cuya key empieza con "prefix:".
+
+        Args:
+            prefix: Prefijo de key (ej. el key_prefix de @cached)
+
+        Returns:
+            Número de entradas eliminadas en SQLite
+        """
+        start = f"{prefix}:"
+        # Rango [prefix:, prefix;) sobre la PK: ';' es el carácter siguiente a ':'
+        end = f"{prefix};"
+
+        with self._lock:
+            for key in [k for k in self._mem if k.startswith(start)]:
+                del self._mem[key]
+            cursor = self._conn.execute(
+                "DELETE FROM cache WHERE key >= ? AND key < ?", (start, end)
+            )
+            return cursor.rowcount
+
     def clear(self):
         """Limpia todo el cache."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.execute("DELETE FROM cache")
+        with self._lock:
+            self._mem.clear()
+            self._conn.execute("DELETE FROM cache")
         logger.info("Cache limpiado")
     
     def cleanup_expired(self) -> int:
@@ -124,10 +293,11 @@ class CacheManager:
         Returns:
             Número de entradas eliminadas
         """
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.execute(
-                "DELETE FROM cache WHERE expires_at < ?",
-                (datetime.now().isoformat(),)
+        with self._lock:
+            self._mem.clear()
+            cursor = self._conn.execute(
+                "DELETE FROM cache WHERE expires_at_unix <= ?",
+                (int(time.time()),)
             )
             deleted = cursor.rowcount
         
@@ -138,17 +308,18 @@ class CacheManager:
     
     def stats(self) -> dict:
         """Obtiene estadísticas del cache."""
-        with sqlite3.connect(self.db_path) as conn:
-            total = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
-            
-            expired = conn.execute(
-                "SELECT COUNT(*) FROM cache WHERE expires_at < ?",
-                (datetime.now().isoformat(),)
-            ).fetchone()[0]
-            
+        with self._lock:
+            conn = self._conn
             by_source = dict(conn.execute(
-                "SELECT source, COUNT(*) FROM cache GROUP BY source"
+                "SELECT source, count FROM cache_stats WHERE count > 0"
             ).fetchall())
+            total = sum(by_source.values())
+
+            # Rango sobre idx_exp_unix: solo lee el índice
+            expired = conn.execute(
+                "SELECT COUNT(*) FROM cache WHERE expires_at_unix <= ?",
+                (int(time.time()),)
+            ).fetchone()[0]
         
         return {
             "total_entries": total,
@@ -157,6 +328,11 @@ class CacheManager:
             "by_source": by_source,
         }
 
+    def close(self):
+        """Cierra la conexión a la base de datos."""
+        with self._lock:
+            self._conn.close()
+
 
 # Funciones helper para uso con decorador
 _default_cache: Optional[CacheManager] = None
@@ -170,35 +346,73 @@ def get_cache() -> CacheManager:
     return _default_cache
 
 
-def cached(key_prefix: str, ttl_hours: int = 24):
+def _cache_key(key_prefix: str, args: tuple, kwargs: dict) -> str:
+    """
+    Construye la key de cache para una llamada.
+
+    Incluye args y kwargs (ordenados) y los resume con blake2b, así la key
+    tiene largo fijo y es estable entre procesos (a diferencia de hash()).
+    """
+    parts = [str(a) for a in args]
+    parts.extend(f"{k}={v}" for k, v in sorted(kwargs.items()))
+    digest = hashlib.blake2b("\x1f".join(parts).encode(), digest_size=16).hexdigest()
+    return f"{key_prefix}:{digest}"
+
+
+def cached(key_prefix: str, ttl_hours: int = 24, ttl_seconds: Optional[int] = None):
     """
     Decorador para cachear resultados de funciones.
+
+    Un resultado None no se guarda; la key queda marcada como faltante y las
+    llamadas siguientes van directo a la función sin consultar SQLite.
+    wrapper.reset_missing() olvida esas marcas (ej. al empezar otra corrida).
+
+    En métodos (primer parámetro "self") la instancia no forma parte de la key.
     
     Usage:
         @cached("fmp_ratios", ttl_hours=12)
         def get_ratios(symbol: str) -> dict:
             ...
+
+    Args:
+        key_prefix: Prefijo de las keys (y source en el cache)
+        ttl_hours: TTL en horas
+        ttl_seconds: TTL en segundos; si se indica, reemplaza a ttl_hours
     """
+    if ttl_seconds is not None:
+        ttl = timedelta(seconds=ttl_seconds)
+    else:
+        ttl = timedelta(hours=ttl_hours)
+
     def decorator(func):
+        missing: set[str] = set()
+        params = inspect.signature(func).parameters
+        skip = 1 if next(iter(params), None) == "self" else 0
+
+        @functools.wraps(func)
         def wrapper(*args, **kwargs):
-            # Construir key desde argumentos
-            key_parts = [key_prefix] + [str(a) for a in args]
-            key = ":".join(key_parts)
-            
+            key = _cache_key(key_prefix, args[skip:], kwargs)
             cache = get_cache()
             
             # Intentar obtener del cache
-            cached_value = cache.get(key)
-            if cached_value is not None:
-                logger.debug(f"Cache hit: {key}")
-                return cached_value
+            if key not in missing:
+                cached_value = cache.get(key)
+                if cached_value is not None:
+                    logger.debug("Cache hit: {}", key)
+                    return cached_value
             
             # Ejecutar función y cachear resultado
             result = func(*args, **kwargs)
-            cache.set(key, result, timedelta(hours=ttl_hours), source=key_prefix)
-            logger.debug(f"Cache miss, stored: {key}")
+            if result is None:
+                missing.add(key)
+                return result
+
+            missing.discard(key)
+            cache.set(key, result, ttl, source=key_prefix)
+            logger.debug("Cache miss, stored: {}", key)
             
             return result
-        
+
+        wrapper.reset_missing = missing.clear
         return wrapper
     return decorator
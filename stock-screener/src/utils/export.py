@@ -1,14 +1,44 @@
 """Utilidades de exportación de resultados."""
 
-import json
+import functools
 from pathlib import Path
 from datetime import datetime
-from typing import Union
+from operator import attrgetter
+from typing import Any, Callable, Union
 
+import numpy as np
+import openpyxl
+import orjson
 import pandas as pd
 from loguru import logger
 
-from src.models.stock import ScreenerResult
+from src.models.stock import METRIC_FIELDS, ScreenerResult, Stock
+
+
+@functools.lru_cache(maxsize=None)
+def _titleize(key: str) -> str:
+    """Convierte un nombre snake_case a Title Case (una vez por key)."""
+    return key.replace("_", " ").title()
+
+
+# Buffer de escritura para JSON/CSV: se escriben muchos fragmentos chicos
+_WRITE_BUFFER = 1 << 20
+
+# (campo de StockMetrics, columna en Title Case)
+_METRIC_COLUMNS = tuple((name, _titleize(name)) for name in METRIC_FIELDS)
+
+# (columna, getter) de los datos básicos de cada stock
+_BASE_COLUMNS = (
+    ("Symbol", attrgetter("symbol")),
+    ("Name", attrgetter("name")),
+    ("Sector", attrgetter("sector")),
+    ("Industry", attrgetter("industry")),
+    ("Exchange", attrgetter("exchange")),
+    ("Price", attrgetter("price")),
+    ("Market Cap", attrgetter("market_cap")),
+    ("Avg Volume", attrgetter("avg_volume")),
+    ("Score", attrgetter("score")),
+)
 
 
 class Exporter:
@@ -22,7 +52,8 @@ class Exporter:
             output_dir: Directorio para guardar outputs
         """
         self.output_dir = Path(output_dir)
-        self.output_dir.mkdir(parents=True, exist_ok=True)
+        # El directorio se crea recién en el primer export
+        self._dir_ready = False
     
     def export(
         self,
@@ -35,7 +66,9 @@ class Exporter:
         
         Args:
             result: Resultado del screener
-            format: Formato (json, csv, xlsx)
+            format: Formato (json, csv, xlsx, feather, parquet). Para releer
+                corridas desde pandas conviene feather/parquet (columnar y
+                binario); csv queda para interoperar con otras herramientas
             filename: Nombre de archivo (auto-genera si no se especifica)
         
         Returns:
@@ -51,88 +84,251 @@ class Exporter:
             return self._export_csv(result, filename)
         elif format == "xlsx":
             return self._export_xlsx(result, filename)
+        elif format == "feather":
+            return self._export_feather(result, filename)
+        elif format == "parquet":
+            return self._export_parquet(result, filename)
         else:
             raise ValueError(f"Formato no soportado: {format}")
     
+    def _output_path(self, filename: str, ext: str) -> Path:
+        """Path de salida para filename.ext, creando el directorio la primera vez."""
+        if not self._dir_ready:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            self._dir_ready = True
+        return self.output_dir / f"{filename}.{ext}"
+
     def _export_json(self, result: ScreenerResult, filename: str) -> Path:
-        """Exporta a JSON."""
-        path = self.output_dir / f"{filename}.json"
+        """
+        Exporta a JSON (orjson; tipos no nativos como Decimal via str).
+
+        Los stocks se codifican y escriben de a uno, sin armar el árbol
+        completo de result.to_dict(); el archivo queda idéntico al de
+        codificar to_dict() entero con OPT_INDENT_2.
+        """
+        path = self._output_path(filename, "json")
         
-        with open(path, "w") as f:
-            json.dump(result.to_dict(), f, indent=2)
+        # Documento sin stocks; "stocks": [] se reemplaza por la lista real.
+        # Un string JSON no puede tener saltos de línea crudos, así que el
+        # marcador (con su indentación) es único.
+        marker = b'\n  "stocks": []'
+        head = {
+            "timestamp": result.timestamp.isoformat(),
+            "config_name": result.config_name,
+            "total_scanned": result.total_scanned,
+            "total_matches": result.total_matches,
+            "stocks": [],
+            "execution_time_seconds": result.execution_time_seconds,
+            "errors": result.errors,
+        }
+        before, after = _dumps_json(head).split(marker)
+
+        with open(path, "wb", buffering=_WRITE_BUFFER) as f:
+            f.write(before)
+            if result.stocks:
+                f.write(b'\n  "stocks": [')
+                for i, stock in enumerate(result.stocks):
+                    # Re-indenta el stock al nivel de la lista (4 espacios)
+                    f.write(b"\n    " if i == 0 else b",\n    ")
+                    f.write(_dumps_json(stock.to_dict()).replace(b"\n", b"\n    "))
+                f.write(b"\n  ]")
+            else:
+                f.write(marker)
+            f.write(after)
         
         logger.info(f"Exportado a {path}")
         return path
     
     def _export_csv(self, result: ScreenerResult, filename: str) -> Path:
-        """Exporta a CSV (solo stocks, aplanado)."""
-        path = self.output_dir / f"{filename}.csv"
+        """
+        Exporta a CSV (solo stocks, aplanado).
+
+        Escribe directo desde las columnas, sin pasar por un DataFrame,
+        formateando cada columna una vez (ver _iter_csv_lines). Hay un solo
+        writer para que el archivo no dependa de las dependencias instaladas.
+        """
+        path = self._output_path(filename, "csv")
         
-        df = self._result_to_dataframe(result)
-        df.to_csv(path, index=False)
+        columns = self._result_columns(result)
+        with open(path, "w", newline="", buffering=_WRITE_BUFFER) as f:
+            f.writelines(_iter_csv_lines(columns))
         
         logger.info(f"Exportado a {path}")
         return path
     
     def _export_xlsx(self, result: ScreenerResult, filename: str) -> Path:
-        """Exporta a Excel con múltiples hojas."""
-        path = self.output_dir / f"{filename}.xlsx"
-        
-        df = self._result_to_dataframe(result)
+        """
+        Exporta a Excel con múltiples hojas.
+
+        Usa un workbook write-only de openpyxl: las filas se escriben en
+        streaming y sin estilos, en lugar de armar el documento en memoria.
+        Las filas salen directo de los stocks, sin DataFrame intermedio.
+        """
+        path = self._output_path(filename, "xlsx")
         
-        with pd.ExcelWriter(path, engine="openpyxl") as writer:
-            # Hoja principal con stocks
-            df.to_excel(writer, sheet_name="Stocks", index=False)
-            
-            # Hoja de resumen
-            summary = pd.DataFrame([{
-                "Timestamp": result.timestamp.isoformat(),
-                "Config": result.config_name,
-                "Total Scanned": result.total_scanned,
-                "Total Matches": result.total_matches,
-                "Execution Time (s)": result.execution_time_seconds,
-            }])
-            summary.to_excel(writer, sheet_name="Summary", index=False)
-            
-            # Hoja de errores si hay
-            if result.errors:
-                errors_df = pd.DataFrame({"Error": result.errors})
-                errors_df.to_excel(writer, sheet_name="Errors", index=False)
+        wb = openpyxl.Workbook(write_only=True)
+
+        # Hoja principal con stocks (NaN -> celda vacía, como to_excel)
+        ws = wb.create_sheet("Stocks")
+        for row in _iter_stock_rows(result.stocks):
+            ws.append([None if v != v else v for v in row])
+
+        # Hoja de resumen
+        ws = wb.create_sheet("Summary")
+        ws.append(["Timestamp", "Config", "Total Scanned", "Total Matches", "Execution Time (s)"])
+        ws.append([
+            result.timestamp.isoformat(),
+            result.config_name,
+            result.total_scanned,
+            result.total_matches,
+            result.execution_time_seconds,
+        ])
+
+        # Hoja de errores si hay
+        if result.errors:
+            ws = wb.create_sheet("Errors")
+            ws.append(["Error"])
+            for error in result.errors:
+                ws.append([error])
+
+        wb.save(path)
         
         logger.info(f"Exportado a {path}")
         return path
     
+    def _export_feather(self, result: ScreenerResult, filename: str) -> Path:
+        """Exporta a Feather (Arrow IPC; requiere pyarrow)."""
+        path = self._output_path(filename, "feather")
+
+        self._result_to_dataframe(result).to_feather(path)
+
+        logger.info(f"Exportado a {path}")
+        return path
+
+    def _export_parquet(self, result: ScreenerResult, filename: str) -> Path:
+        """Exporta a Parquet comprimido con zstd (requiere pyarrow)."""
+        path = self._output_path(filename, "parquet")
+
+        self._result_to_dataframe(result).to_parquet(
+            path, engine="pyarrow", compression="zstd", compression_level=3, index=False
+        )
+
+        logger.info(f"Exportado a {path}")
+        return path
+
     def _result_to_dataframe(self, result: ScreenerResult) -> pd.DataFrame:
         """Convierte resultado a DataFrame aplanado."""
-        rows = []
-        
-        for stock in result.stocks:
-            row = {
-                "Symbol": stock.symbol,
-                "Name": stock.name,
-                "Sector": stock.sector,
-                "Industry": stock.industry,
-                "Exchange": stock.exchange,
-                "Price": stock.price,
-                "Market Cap": stock.market_cap,
-                "Avg Volume": stock.avg_volume,
-                "Score": stock.score,
-            }
-            
-            # Agregar métricas
-            metrics = stock.metrics.to_dict()
-            for key, value in metrics.items():
-                # Convertir nombre de snake_case a Title Case
-                col_name = key.replace("_", " ").title()
-                row[col_name] = value
-            
-            # Agregar score breakdown
-            for key, value in stock.score_breakdown.items():
-                row[f"Score {key.title()}"] = value
-            
-            rows.append(row)
-        
-        return pd.DataFrame(rows)
+        return pd.DataFrame(self._result_columns(result), copy=False)
+
+    def _result_columns(self, result: ScreenerResult) -> dict[str, Union[list, np.ndarray]]:
+        """
+        Aplana el resultado a columnas: nombre de columna -> valores.
+
+        Se arma columna por columna (una lista por campo) en lugar de un
+        dict por stock. Las métricas sin ningún valor se omiten, igual que
+        cuando cada fila venía de metrics.to_dict(). El score breakdown va
+        en arrays float64 (NaN si el stock no tiene esa categoría).
+        """
+        stocks = result.stocks
+        columns = {
+            name: [get(s) for s in stocks]
+            for name, get in _column_layout(stocks, breakdown=False)
+        }
+        columns.update(_breakdown_arrays(stocks))
+        return columns
+
+
+def _breakdown_arrays(stocks: list[Stock]) -> dict[str, np.ndarray]:
+    """Columnas del score breakdown como arrays float64, en una pasada."""
+    keys = dict.fromkeys(key for s in stocks for key in s.score_breakdown)
+    arrays = {key: np.full(len(stocks), np.nan) for key in keys}
+    for i, stock in enumerate(stocks):
+        for key, value in stock.score_breakdown.items():
+            if value is not None:
+                arrays[key][i] = value
+    return {f"Score {key.title()}": array for key, array in arrays.items()}
+
+
+def _column_layout(
+    stocks: list[Stock], breakdown: bool = True
+) -> list[tuple[str, Callable[[Stock], Any]]]:
+    """
+    Columnas del export plano: (nombre, getter) en orden.
+
+    Solo recorre los stocks para descartar métricas sin ningún valor y
+    juntar las keys del score breakdown (en orden de aparición).
+    """
+    layout = list(_BASE_COLUMNS)
+
+    # Agregar métricas
+    for name, col_name in _METRIC_COLUMNS:
+        if any(getattr(s.metrics, name) is not None for s in stocks):
+            layout.append((col_name, attrgetter(f"metrics.{name}")))
+
+    if not breakdown:
+        return layout
+
+    # Agregar score breakdown
+    breakdown_keys = dict.fromkeys(key for s in stocks for key in s.score_breakdown)
+    for key in breakdown_keys:
+        layout.append((f"Score {key.title()}", lambda s, key=key: s.score_breakdown.get(key)))
+
+    return layout
+
+
+def _iter_stock_rows(stocks: list[Stock]):
+    """Genera el header y luego una tupla por stock, sin armar columnas."""
+    layout = _column_layout(stocks)
+    yield tuple(name for name, _ in layout)
+    getters = [get for _, get in layout]
+    for stock in stocks:
+        yield tuple(get(stock) for get in getters)
+
+
+def _dumps_json(obj) -> bytes:
+    """Codifica con las opciones del export JSON (indentado, numpy, default=str)."""
+    return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY, default=str)
+
+
+def _csv_field(value) -> str:
+    """Formatea un valor como csv.writer (QUOTE_MINIMAL); None es vacío."""
+    if value is None:
+        return ""
+    text = str(value)
+    if any(c in text for c in ',"\r\n'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def _iter_csv_lines(columns: dict[str, list]):
+    """
+    Genera las líneas CSV (header y una por stock) a partir de las columnas.
+
+    Las columnas numéricas, la mayoría en un export, se formatean con str()
+    sin pasar por la lógica de quoting. La salida es la misma que la de
+    DataFrame.to_csv(index=False): líneas con "\n", None/NaN vacíos y
+    columnas enteras con algún faltante o float escritas como float
+    ("300.0"), igual que el upcast a float64 de pandas.
+    """
+    formatted = []
+    for values in columns.values():
+        if isinstance(values, np.ndarray):
+            formatted.append(["" if v != v else str(v) for v in values.tolist()])
+        elif all(v is None or isinstance(v, (int, float)) for v in values):
+            formatted.append(_format_numeric(values))
+        else:
+            formatted.append([_csv_field(v) for v in values])
+
+    yield ",".join(_csv_field(name) for name in columns) + "\n"
+    for row in zip(*formatted):
+        yield ",".join(row) + "\n"
+
+
+def _format_numeric(values: list) -> list[str]:
+    """Formatea una columna numérica como pandas (float64 si hay None o floats)."""
+    if any(v is None or isinstance(v, float) for v in values):
+        return ["" if v is None or v != v else str(float(v)) for v in values]
+    return [str(v) for v in values]
 
 
 def quick_export(result: ScreenerResult, format: str = "json") -> Path:
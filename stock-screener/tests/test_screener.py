@@ -1,5 +1,12 @@
 """Tests para el stock screener."""
 
+import asyncio
+import random
+import sys
+import time
+import types
+from dataclasses import replace
+
 import pytest
 from unittest.mock import Mock, patch
 from datetime import datetime
@@ -94,6 +101,29 @@ def failing_stock():
     )
 
 
+# Métricas que reciben valores aleatorios en random_stocks
+RANDOM_METRICS = (
+    "pe_ratio", "peg_ratio", "eps_growth_5y", "revenue_growth_5y", "roe", "roa",
+    "net_margin", "current_ratio", "quick_ratio", "debt_to_equity",
+)
+
+
+def random_stocks(n: int, seed: int = 0) -> list[Stock]:
+    """Stocks reproducibles con métricas aleatorias: faltantes, chicas o fuera de rango."""
+    rng = random.Random(seed)
+    return [
+        Stock(
+            symbol=f"R{i}", name="Random", exchange="NYSE", sector="Technology",
+            industry="Software", price=10, market_cap=3e9, avg_volume=400000,
+            metrics=StockMetrics(**{
+                name: rng.choice([None, rng.uniform(-0.5, 3), rng.uniform(0, 60)])
+                for name in RANDOM_METRICS
+            }),
+        )
+        for i in range(n)
+    ]
+
+
 # === Tests de Modelos ===
 
 class TestStockMetrics:
@@ -137,6 +167,38 @@ class TestStock:
         criteria = {"pe_ratio": {"min": 0, "max": 10}}
         assert passing_stock.passes_filter(criteria) is False
 
+    def test_compiled_criteria_match_passes_filter(self, passing_stock, failing_stock):
+        from src.models.stock import compile_criteria, passes_compiled
+
+        criteria = {"pe_ratio": {"min": 0, "max": 20}, "roe": {"min": 0.15}, "unknown": {"max": 0}}
+        compiled = compile_criteria(criteria)
+
+        for stock in (passing_stock, failing_stock):
+            assert passes_compiled(stock.metrics, compiled) == stock.passes_filter(criteria)
+        assert passes_compiled(passing_stock.metrics, compiled) is True
+
+    def test_from_dict_roundtrip(self, passing_stock):
+        restored = Stock.from_dict(passing_stock.to_dict())
+
+        assert restored == passing_stock
+        assert not hasattr(restored, "__dict__")
+
+
+class TestStockUniverse:
+    def test_passes_filter_batch_matches_passes_filter(self):
+        import numpy as np
+        from src.models.stock import StockUniverse
+
+        stocks = random_stocks(200)
+        criteria = {"pe_ratio": {"min": 0, "max": 20}, "roe": {"min": 0.15}, "debt_to_equity": {"max": 1}}
+
+        universe = StockUniverse.from_stocks(stocks)
+        mask = universe.passes_filter_batch(criteria)
+
+        assert universe.to_stocks(mask) == [s for s in stocks if s.passes_filter(criteria)]
+        assert universe["roe"].dtype == np.float32
+        assert universe["market_cap"].dtype == np.int64
+
 
 # === Tests de Filtros ===
 
@@ -157,6 +219,12 @@ class TestFilterEngine:
         assert any("peg_ratio" in f for f in failing)
         assert any("roe" in f for f in failing)
     
+    def test_first_failing_filter(self, sample_config, passing_stock, failing_stock):
+        engine = FilterEngine(sample_config)
+
+        assert engine.first_failing_filter(passing_stock) is None
+        assert engine.first_failing_filter(failing_stock) == engine.get_failing_filters(failing_stock)[0]
+
     def test_evaluate_returns_all_filters(self, sample_config, passing_stock):
         engine = FilterEngine(sample_config)
         evaluation = engine.evaluate(passing_stock)
@@ -164,6 +232,70 @@ class TestFilterEngine:
         assert isinstance(evaluation, dict)
         assert all(isinstance(v, bool) for v in evaluation.values())
 
+    def test_compiled_passes_all_matches_generic_path(self, sample_config, passing_stock, failing_stock):
+        sample_config["operability"] = {"exclude_sectors": ["Energy"]}
+        sample_config["valuation"]["pe_ratio"]["reject_rate"] = 0.9
+        energy = Stock(
+            symbol="OIL", name="Oil Co", exchange="NYSE", sector="Energy", industry="Oil",
+            price=10, market_cap=3e9, avg_volume=400000, metrics=passing_stock.metrics,
+        )
+        compiled = FilterEngine(sample_config)
+        generic = FilterEngine(sample_config, debug=True)
+
+        for stock in (passing_stock, failing_stock, energy):
+            assert compiled.passes_all(stock) is generic.passes_all(stock)
+        assert compiled._passes_all_source.index("pe_ratio") < compiled._passes_all_source.index("peg_ratio")
+
+    def test_optimize_order_uses_observed_rejections(self, sample_config, failing_stock):
+        engine = FilterEngine(sample_config)
+        assert engine.filter_names[0] == "valuation.pe_ratio"
+
+        engine.evaluate(failing_stock)
+        engine.optimize_order()
+
+        assert engine.filter_names[0] == "valuation.peg_ratio"
+        assert engine.passes_all(failing_stock) is False
+
+    def test_prefilter_passes_finviz_rows(self, sample_config):
+        sample_config["valuation"]["pe_ratio"]["max"] = 30
+        sample_config["operability"] = {"market_cap_min": 2e9, "exclude_sectors": ["Energy"]}
+        engine = FilterEngine(sample_config)
+
+        # El P/E de Finviz puede no coincidir con el de Yahoo: no descarta
+        assert engine.prefilter({"symbol": "NODATA"}) is True
+        assert engine.prefilter({"symbol": "PE", "pe": 45, "market_cap": 5e9}) is True
+        assert engine.prefilter({"symbol": "CAP", "pe": 15, "market_cap": 1e9}) is True
+        assert engine.prefilter({"symbol": "OIL", "sector": "Energy"}) is True
+
+    def test_prefilter_reads_yahoo_info(self, sample_config):
+        sample_config["valuation"]["pe_ratio"]["max"] = 30
+        sample_config["operability"] = {"market_cap_min": 2e9, "exclude_sectors": ["Energy"]}
+        engine = FilterEngine(sample_config)
+
+        def yahoo(**info):
+            return {"symbol": "Y", "info": info}
+
+        assert engine.prefilter(yahoo(trailingPE=15, marketCap=5e9, sector="Technology")) is True
+        assert engine.prefilter(yahoo(regularMarketPrice=10)) is True
+        assert engine.prefilter(yahoo(trailingPE=45, marketCap=5e9)) is False
+        assert engine.prefilter(yahoo(forwardPE=45)) is False
+        assert engine.prefilter(yahoo(trailingPE=15, marketCap=1e9)) is False
+        assert engine.prefilter(yahoo(sector="Energy")) is False
+
+    def test_passes_batch_matches_passes_all(self, sample_config, passing_stock, failing_stock):
+        sample_config["valuation"]["pe_ratio"]["required"] = True
+        missing_pe = Stock(
+            symbol="NOPE", name="No PE", exchange="NYSE", sector="Energy", industry="Oil",
+            price=10, market_cap=3e9, avg_volume=400000,
+            metrics=StockMetrics(roe=0.3, current_ratio=2.0, quick_ratio=1.5),
+        )
+        stocks = [passing_stock, failing_stock, missing_pe]
+        engine = FilterEngine(sample_config)
+
+        keep = engine.passes_batch(stocks)
+
+        assert keep.tolist() == [engine.passes_all(s) for s in stocks] == [True, False, False]
+
 
 # === Tests de Scoring ===
 
@@ -192,6 +324,54 @@ class TestScoringEngine:
         
         assert good_score > bad_score
 
+    def test_score_with_bound_prunes_below_cutoff(self, sample_config, passing_stock, failing_stock):
+        engine = ScoringEngine(sample_config["scoring"])
+        good_score, _ = engine.score(passing_stock)
+
+        assert engine.score_with_bound(passing_stock, float("-inf")) == engine.score(passing_stock)
+        assert engine.score_with_bound(failing_stock, good_score + 1) is None
+
+    def test_top_k_matches_full_sort(self, sample_config):
+        engine = ScoringEngine(sample_config["scoring"])
+        stocks = random_stocks(300)
+        expected = sorted(stocks, key=lambda s: engine.score(s)[0], reverse=True)[:20]
+
+        top = engine.top_k(stocks, 20)
+
+        assert [s.symbol for s in top] == [s.symbol for s in expected]
+        assert all(s.score == engine.score(s)[0] for s in top)
+
+    def test_top_k_with_zero_k(self, sample_config):
+        engine = ScoringEngine(sample_config["scoring"])
+
+        assert engine.top_k(random_stocks(5), 0) == []
+
+    def test_top_k_with_negative_weight(self):
+        engine = ScoringEngine({"weights": {
+            "valuation": 0.5, "growth": 0.3, "profitability": 0.4, "financial_health": -0.6,
+        }})
+        stocks = random_stocks(300)
+        expected = sorted(stocks, key=lambda s: engine.score(s)[0], reverse=True)[:20]
+
+        top = engine.top_k(stocks, 20)
+
+        assert [s.symbol for s in top] == [s.symbol for s in expected]
+
+    def test_score_batch_matches_score(self, sample_config, passing_stock, failing_stock):
+        engine = ScoringEngine(sample_config["scoring"])
+        empty = Stock(
+            symbol="EMPTY", name="No Data", exchange="NYSE", sector="Technology",
+            industry="Software", price=10, market_cap=3e9, avg_volume=400000,
+        )
+        stocks = [passing_stock, failing_stock, empty] + random_stocks(200)
+
+        scores, breakdown = engine.score_batch(stocks)
+
+        for i, stock in enumerate(stocks):
+            score, expected = engine.score(stock)
+            assert scores[i] == pytest.approx(score)
+            assert breakdown[i].tolist() == pytest.approx(list(expected.values()))
+
 
 # === Tests de Integración ===
 
@@ -213,6 +393,631 @@ class TestScreenerResult:
         assert data["total_matches"] == 10
         assert len(data["stocks"]) == 1
 
+    def test_to_json_bytes_matches_to_dict(self, passing_stock):
+        import json
+
+        result = ScreenerResult(
+            timestamp=datetime.now(),
+            config_name="Test",
+            total_scanned=100,
+            total_matches=1,
+            stocks=[passing_stock],
+            execution_time_seconds=1.5,
+        )
+
+        assert json.loads(result.to_json_bytes()) == result.to_dict()
+
+    def test_to_dict_reflects_later_changes(self, passing_stock):
+        import json
+
+        result = ScreenerResult(
+            timestamp=datetime.now(),
+            config_name="Test",
+            total_scanned=100,
+            total_matches=1,
+            stocks=[passing_stock],
+            execution_time_seconds=1.5,
+        )
+        assert result.to_dict()["errors"] == []
+
+        result.errors.append("XYZ: timeout")
+        result.stocks[0].score = 88.0
+
+        assert result.to_dict()["errors"] == ["XYZ: timeout"]
+        assert result.to_dict()["stocks"][0]["score"] == 88.0
+        assert json.loads(result.to_json_bytes())["errors"] == ["XYZ: timeout"]
+
+
+class TestExporter:
+    @pytest.fixture
+    def result(self, passing_stock):
+        return ScreenerResult(
+            timestamp=datetime.now(),
+            config_name="Test",
+            total_scanned=100,
+            total_matches=1,
+            stocks=[passing_stock],
+            execution_time_seconds=1.5,
+            errors=["XYZ: timeout"],
+        )
+
+    def test_export_json_roundtrip(self, tmp_path, result):
+        import json
+        import orjson
+        from src.utils.export import Exporter
+
+        path = Exporter(output_dir=str(tmp_path)).export(result, "json", "out")
+
+        assert json.loads(path.read_bytes()) == result.to_dict()
+        assert path.read_bytes() == orjson.dumps(result.to_dict(), option=orjson.OPT_INDENT_2)
+
+    def test_output_dir_created_on_first_export(self, tmp_path, result):
+        from src.utils.export import Exporter
+
+        exporter = Exporter(output_dir=str(tmp_path / "out"))
+        assert not (tmp_path / "out").exists()
+
+        assert exporter.export(result, "json", "r").parent == tmp_path / "out"
+
+    def test_export_csv(self, tmp_path, result):
+        import pandas as pd
+        from src.utils.export import Exporter
+
+        path = Exporter(output_dir=str(tmp_path)).export(result, "csv", "out")
+        df = pd.read_csv(path)
+
+        assert list(df["Symbol"]) == ["PASS"]
+        assert df["Pe Ratio"][0] == 15
+
+    def test_csv_lines_match_pandas_to_csv(self):
+        import pandas as pd
+        from src.utils.export import _iter_csv_lines
+
+        columns = {
+            "Price": [1.5, None, 3],
+            "Name": ['A "B"', "C, D", None],
+            "Avg Volume": [300, None, 400],
+            "Shares": [1, 2, 3],
+            "Pe Ratio": [None, 2.25, 1e-7],
+        }
+        expected = pd.DataFrame(columns).to_csv(index=False, lineterminator="\n")
+
+        assert "".join(_iter_csv_lines(columns)) == expected
+
+    def test_export_csv_matches_to_csv_with_missing_market_data(self, tmp_path, result, failing_stock):
+        from src.utils.export import Exporter
+
+        failing_stock.market_cap = None
+        failing_stock.avg_volume = None
+        result.stocks.append(failing_stock)
+        exporter = Exporter(output_dir=str(tmp_path))
+
+        path = exporter.export(result, "csv", "out")
+        expected = exporter._result_to_dataframe(result).to_csv(index=False, lineterminator="\n")
+
+        assert path.read_bytes() == expected.encode()
+
+    def test_export_xlsx_sheets(self, tmp_path, result):
+        import pandas as pd
+        from src.utils.export import Exporter
+
+        path = Exporter(output_dir=str(tmp_path)).export(result, "xlsx", "out")
+        sheets = pd.read_excel(path, sheet_name=None)
+
+        assert list(sheets) == ["Stocks", "Summary", "Errors"]
+        assert sheets["Stocks"]["Symbol"].tolist() == ["PASS"]
+        assert sheets["Stocks"]["Pe Ratio"][0] == 15
+        assert sheets["Summary"]["Total Scanned"][0] == 100
+        assert sheets["Errors"]["Error"].tolist() == ["XYZ: timeout"]
+
+    @pytest.mark.parametrize("format", ["feather", "parquet"])
+    def test_export_columnar_roundtrip(self, tmp_path, result, format):
+        pytest.importorskip("pyarrow")
+        import pandas as pd
+        from src.utils.export import Exporter
+
+        exporter = Exporter(output_dir=str(tmp_path))
+        path = exporter.export(result, format, "out")
+        read = pd.read_feather if format == "feather" else pd.read_parquet
+
+        pd.testing.assert_frame_equal(read(path), exporter._result_to_dataframe(result))
+
+
+class TestCacheManager:
+    @pytest.fixture
+    def cache(self, tmp_path):
+        from src.utils.cache import CacheManager
+
+        cache = CacheManager(db_path=str(tmp_path / "cache.db"))
+        yield cache
+        cache.close()
+
+    def test_set_get_delete(self, cache):
+        cache.set("k", {"a": [1, 2]}, source="test")
+
+        assert cache.get("k") == {"a": [1, 2]}
+        assert cache.stats()["by_source"] == {"test": 1}
+
+        cache.delete("k")
+        assert cache.get("k") is None
+
+    def test_stats_counts_follow_writes(self, cache):
+        from datetime import timedelta
+
+        cache.set("p:1", 1, source="a")
+        cache.set("p:1", 2, source="b")
+        cache.set_many([("p:2", 2, None, "b"), ("q:1", 1, timedelta(seconds=-5), "a")])
+
+        stats = cache.stats()
+        assert stats["by_source"] == {"a": 1, "b": 2}
+        assert stats["expired_entries"] == 1
+        assert cache.get("q:1") is None
+
+        cache.delete_prefix("p")
+        assert cache.cleanup_expired() == 1
+        assert cache.stats()["total_entries"] == 0
+
+    def test_numpy_values_roundtrip(self, cache):
+        import numpy as np
+
+        cache.set("k", {"pe": np.float64(12.5), "history": np.array([1.0, 2.0])})
+
+        assert cache.get("k") == {"pe": 12.5, "history": [1.0, 2.0]}
+
+    def test_memory_layer_skips_sqlite_and_evicts_lru(self, tmp_path):
+        from src.utils.cache import CacheManager
+
+        cache = CacheManager(db_path=str(tmp_path / "cache.db"), mem_max_entries=2)
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+            cache.get(key)
+
+        assert list(cache._mem) == ["b", "c"]
+
+        cache._conn.execute("DELETE FROM cache")
+        assert cache.get("c") == "c"
+        assert cache.get("a") is None
+        cache.close()
+
+    def test_connection_is_shared_across_threads(self, cache):
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda i: cache.set(f"k{i}", i), range(100)))
+            values = list(executor.map(lambda i: cache.get(f"k{i}"), range(100)))
+
+        assert values == list(range(100))
+
+    def test_cached_decorator_keys_include_kwargs(self, cache):
+        from src.utils.cache import cached
+
+        calls = []
+
+        @cached("test")
+        def fetch(symbol, period="1y"):
+            calls.append((symbol, period))
+            return [symbol, period] if symbol != "NONE" else None
+
+        with patch("src.utils.cache.get_cache", return_value=cache):
+            assert fetch("AAPL") == ["AAPL", "1y"]
+            assert fetch("AAPL", period="5y") == ["AAPL", "5y"]
+            assert fetch("AAPL") == ["AAPL", "1y"]
+            assert fetch("NONE") is None
+            assert fetch("NONE") is None
+
+        assert calls == [("AAPL", "1y"), ("AAPL", "5y"), ("NONE", "1y"), ("NONE", "1y")]
+
+    def test_cached_method_key_ignores_self_and_prefix_invalidation(self, cache):
+        from src.utils.cache import cached
+
+        class Client:
+            calls = 0
+
+            @cached("latest", ttl_seconds=60)
+            def latest(self, limit=10):
+                Client.calls += 1
+                return [limit]
+
+        with patch("src.utils.cache.get_cache", return_value=cache):
+            assert Client().latest() == [10]
+            assert Client().latest() == [10]
+            assert Client.calls == 1
+
+            assert cache.delete_prefix("latest") == 1
+            assert Client().latest() == [10]
+            assert Client.calls == 2
+
+
+class TestStockCache:
+    def test_build_stock_is_cached_per_day(self, tmp_path, passing_stock):
+        from src.core.stock_cache import cache_stocks
+        from src.utils.cache import CacheManager
+
+        build = Mock(return_value=passing_stock)
+        cached_build = cache_stocks(build, CacheManager(db_path=str(tmp_path / "cache.db")))
+
+        first = cached_build("PASS", {"symbol": "PASS"})
+        second = cached_build("PASS", {"symbol": "PASS"})
+
+        assert build.call_count == 1
+        assert second == first == passing_stock
+
+    def test_new_stocks_are_written_in_batches(self, tmp_path, passing_stock):
+        from src.core.stock_cache import cache_stocks
+        from src.utils.cache import CacheManager
+
+        cache = CacheManager(db_path=str(tmp_path / "cache.db"))
+        build = Mock(return_value=passing_stock)
+        cached_build = cache_stocks(build, cache, flush_every=3)
+
+        cached_build("A")
+        cached_build("B")
+        assert cache.stats()["total_entries"] == 0
+        assert cached_build("A") == passing_stock
+        assert build.call_count == 2
+
+        cached_build("C")
+        assert cache.stats()["total_entries"] == 3
+
+        cached_build("D")
+        cached_build.flush()
+        assert cache.stats()["total_entries"] == 4
+
+    def test_missing_stock_is_not_cached(self, tmp_path):
+        from src.core.stock_cache import cache_stocks
+        from src.utils.cache import CacheManager
+
+        build = Mock(return_value=None)
+        cached_build = cache_stocks(build, CacheManager(db_path=str(tmp_path / "cache.db")))
+
+        assert cached_build("NONE") is None
+        assert cached_build("NONE") is None
+        assert build.call_count == 2
+
+
+class TestStockScreener:
+    @pytest.fixture
+    def screener(self, tmp_path, sample_config):
+        import json
+        from src.core.screener import StockScreener
+
+        config = dict(sample_config, data_source="yahoo", execution={"max_workers": 4})
+        config_path = tmp_path / "test.json"
+        config_path.write_text(json.dumps(config))
+
+        return StockScreener(config_path=str(config_path), use_cache=False)
+
+    def test_extends_merges_nested_sections(self, tmp_path, screener):
+        import json
+
+        base = json.loads((tmp_path / "test.json").read_text())
+        child = {"name": "Child", "extends": "test", "valuation": {"pe_ratio": {"max": 25}}}
+        (tmp_path / "child.json").write_text(json.dumps(child))
+
+        merged = screener._load_config(str(tmp_path / "child.json"))
+
+        assert merged["name"] == "Child"
+        assert merged["valuation"]["pe_ratio"] == {"min": 0, "max": 25}
+        assert merged["valuation"]["peg_ratio"] == base["valuation"]["peg_ratio"]
+        assert "extends" not in merged
+
+    def test_run_builds_filters_and_scores(self, screener, passing_stock, failing_stock):
+        stocks = {"PASS": passing_stock, "FAIL": failing_stock}
+        screener.yahoo_client = Mock()
+        screener.yahoo_client.screen_stocks.return_value = [
+            {"symbol": "PASS"}, {"symbol": "FAIL"}, {"symbol": ""},
+        ]
+        screener.yahoo_client.build_stock.side_effect = lambda symbol, _: stocks[symbol]
+
+        result = screener.run()
+
+        assert result.total_scanned == 2
+        assert [s.symbol for s in result.stocks] == ["PASS"]
+        assert result.stocks[0].score is not None
+
+    def test_run_skips_fetch_for_prefiltered_candidates(self, screener, passing_stock):
+        screener.yahoo_client = Mock()
+        screener.yahoo_client.screen_stocks.return_value = [
+            {"symbol": "PASS", "info": {"trailingPE": 15}}, {"symbol": "LOSS", "info": {"trailingPE": -3}},
+        ]
+        screener.yahoo_client.build_stock.return_value = passing_stock
+
+        result = screener.run()
+
+        assert result.total_scanned == 2
+        screener.yahoo_client.build_stock.assert_called_once_with(
+            "PASS", {"symbol": "PASS", "info": {"trailingPE": 15}}
+        )
+
+    def test_run_records_build_errors(self, screener, passing_stock):
+        def build(symbol, _):
+            if symbol == "BOOM":
+                raise RuntimeError("timeout")
+            return passing_stock
+
+        screener.yahoo_client = Mock()
+        screener.yahoo_client.screen_stocks.return_value = [{"symbol": "PASS"}, {"symbol": "BOOM"}]
+        screener.yahoo_client.build_stock.side_effect = build
+
+        result = screener.run()
+
+        assert result.total_matches == 1
+        assert result.errors == ["BOOM: timeout"]
+
+    def test_run_keeps_candidate_order(self, screener, passing_stock):
+        symbols = ["A", "B", "BOOM1", "C", "BOOM2", "D"]
+
+        def build(symbol, _):
+            # Los primeros candidatos terminan últimos
+            time.sleep(0.01 * (len(symbols) - symbols.index(symbol)))
+            if symbol.startswith("BOOM"):
+                raise RuntimeError("timeout")
+            return replace(passing_stock, symbol=symbol)
+
+        screener.config["scoring"]["enabled"] = False
+        screener.config["output"] = {"max_results": 3}
+        screener.yahoo_client = Mock()
+        screener.yahoo_client.screen_stocks.return_value = [{"symbol": s} for s in symbols]
+        screener.yahoo_client.build_stock.side_effect = build
+
+        result = screener.run()
+
+        assert [s.symbol for s in result.stocks] == ["A", "B", "C"]
+        assert result.errors == ["BOOM1: timeout", "BOOM2: timeout"]
+
+    def test_run_async_matches_run(self, screener, passing_stock, failing_stock):
+        stocks = {"PASS": passing_stock, "FAIL": failing_stock}
+
+        async def build_async(symbol, _, executor=None):
+            if symbol == "BOOM":
+                raise RuntimeError("timeout")
+            return stocks[symbol]
+
+        screener.yahoo_client = Mock()
+        screener.yahoo_client.screen_stocks.return_value = [
+            {"symbol": "PASS"}, {"symbol": "FAIL"}, {"symbol": "BOOM"},
+        ]
+        screener.yahoo_client.build_stock_async.side_effect = build_async
+
+        result = asyncio.run(screener.run_async())
+
+        assert result.total_scanned == 3
+        assert [s.symbol for s in result.stocks] == ["PASS"]
+        assert result.errors == ["BOOM: timeout"]
+
+    def test_run_async_keeps_candidate_order(self, screener, passing_stock):
+        symbols = ["A", "B", "BOOM1", "C", "BOOM2", "D"]
+
+        async def build_async(symbol, _, executor=None):
+            # Los primeros candidatos terminan últimos
+            await asyncio.sleep(0.01 * (len(symbols) - symbols.index(symbol)))
+            if symbol.startswith("BOOM"):
+                raise RuntimeError("timeout")
+            return replace(passing_stock, symbol=symbol)
+
+        screener.config["scoring"]["enabled"] = False
+        screener.config["output"] = {"max_results": 3}
+        screener.yahoo_client = Mock()
+        screener.yahoo_client.screen_stocks.return_value = [{"symbol": s} for s in symbols]
+        screener.yahoo_client.build_stock_async.side_effect = build_async
+
+        result = asyncio.run(screener.run_async())
+
+        assert [s.symbol for s in result.stocks] == ["A", "B", "C"]
+        assert result.errors == ["BOOM1: timeout", "BOOM2: timeout"]
+
+
+class TestSupabaseClient:
+    @pytest.fixture
+    def db(self, monkeypatch):
+        """src.db con supabase y asyncpg reemplazados por módulos falsos."""
+        supabase = types.ModuleType("supabase")
+        supabase.create_client = lambda *args, **kwargs: Mock()
+        supabase.Client = object
+        supabase.ClientOptions = lambda **kwargs: None
+        asyncpg = types.ModuleType("asyncpg")
+        asyncpg.Connection = object
+        asyncpg.Pool = object
+        asyncpg.create_pool = None
+        monkeypatch.setitem(sys.modules, "supabase", supabase)
+        monkeypatch.setitem(sys.modules, "asyncpg", asyncpg)
+        for name in ("src.db", "src.db.supabase_client", "src.db.async_pool"):
+            monkeypatch.delitem(sys.modules, name, raising=False)
+
+        from src.db import async_pool, supabase_client
+        return supabase_client, async_pool
+
+    @staticmethod
+    def _baseline_row(stock, run_id):
+        """Fila de stocks tal como la armaba el _stock_to_dict original."""
+        metrics = stock.metrics
+        breakdown = stock.score_breakdown or {}
+        return {
+            "run_id": run_id,
+            "symbol": stock.symbol,
+            "name": stock.name,
+            "exchange": stock.exchange,
+            "sector": stock.sector,
+            "industry": stock.industry,
+            "price": stock.price,
+            "market_cap": int(stock.market_cap) if stock.market_cap else None,
+            "avg_volume": int(stock.avg_volume) if stock.avg_volume else None,
+            "pe_ratio": metrics.pe_ratio,
+            "peg_ratio": metrics.peg_ratio,
+            "pb_ratio": metrics.pb_ratio,
+            "ps_ratio": metrics.ps_ratio,
+            "eps_growth_5y": metrics.eps_growth_5y,
+            "revenue_growth_5y": metrics.revenue_growth_5y,
+            "eps_growth_ttm": metrics.eps_growth_ttm,
+            "roe": metrics.roe,
+            "roa": metrics.roa,
+            "gross_margin": metrics.gross_margin,
+            "operating_margin": metrics.operating_margin,
+            "net_margin": metrics.net_margin,
+            "current_ratio": metrics.current_ratio,
+            "quick_ratio": metrics.quick_ratio,
+            "debt_to_equity": metrics.debt_to_equity,
+            "interest_coverage": metrics.interest_coverage,
+            "score": stock.score,
+            "score_valuation": breakdown.get("score_valuation"),
+            "score_growth": breakdown.get("score_growth"),
+            "score_profitability": breakdown.get("score_profitability"),
+            "score_financial_health": breakdown.get("score_financial_health"),
+        }
+
+    def test_stock_to_dict_matches_baseline(self, db, passing_stock):
+        supabase_client, _ = db
+        client = supabase_client.SupabaseClient(url="http://db", key="k")
+        passing_stock.score = 72.5
+        passing_stock.score_breakdown = {"score_valuation": 80.0, "score_growth": 65.0}
+        sparse = Stock(
+            symbol="SPRS", name="Sparse", exchange="", sector="", industry="",
+            price=0, market_cap=0, avg_volume=0,
+        )
+
+        for stock in (passing_stock, sparse):
+            row = client._stock_to_dict(stock, "run-1")
+            assert row == self._baseline_row(stock, "run-1")
+            assert list(row) == list(self._baseline_row(stock, "run-1"))
+
+        assert client._stock_to_dict(passing_stock, "run-1")["market_cap"] == 5_000_000_000
+        assert client._stock_to_dict(sparse, "run-1")["avg_volume"] is None
+
+    def test_insert_rows_groups_by_column_set(self, db):
+        supabase_client, _ = db
+        client = supabase_client.SupabaseClient(url="http://db", key="k")
+        client.INSERT_BATCH_SIZE = 2
+        rows = [
+            {"symbol": "A", "score": 1.0},
+            {"symbol": "B", "score": 2.0, "ai_score": 7.0},
+            {"symbol": "C", "score": 3.0},
+            {"symbol": "D", "score": 4.0},
+        ]
+
+        with patch.object(client, "_insert_batches_async", new=Mock(return_value=None)) as send, \
+                patch.object(supabase_client.asyncio, "run"):
+            client._insert_rows("stocks", rows)
+
+        table, batches = send.call_args.args
+        assert table == "stocks"
+        assert [[r["symbol"] for r in b] for b in batches] == [["A", "C"], ["D"], ["B"]]
+        client.client.table.assert_not_called()
+
+        client._insert_rows("stocks", rows[2:])
+        assert client.client.table.return_value.insert.call_count == 1
+
+    def test_insert_rows_inside_event_loop_goes_sequential(self, db):
+        supabase_client, _ = db
+        client = supabase_client.SupabaseClient(url="http://db", key="k")
+        rows = [{"symbol": "A", "score": 1.0}, {"symbol": "B", "score": 2.0, "ai_score": 7.0}]
+
+        async def save():
+            client._insert_rows("stocks", rows)
+
+        with patch.object(client, "_insert_batches_async") as send:
+            asyncio.run(save())
+
+        send.assert_not_called()
+        inserted = [c.args[0] for c in client.client.table.return_value.insert.call_args_list]
+        assert inserted == [[rows[0]], [rows[1]]]
+
+    def test_insert_unnest_passes_one_typed_array_per_column(self, db, passing_stock, failing_stock):
+        supabase_client, async_pool = db
+        client = supabase_client.SupabaseClient(url="http://db", key="k")
+        conn = Mock()
+
+        async def execute(query, *args):
+            conn.calls.append((query, args))
+
+        conn.calls = []
+        conn.execute = execute
+        columns = supabase_client.STOCK_COLUMN_NAMES
+        arrays = client._stock_columns([passing_stock, failing_stock])
+        asyncio.run(async_pool.insert_unnest(
+            conn, "stocks", "run-1", columns, supabase_client.STOCK_COLUMN_TYPES, arrays,
+        ))
+
+        (query, args), = conn.calls
+        assert query.startswith(f"INSERT INTO stocks (run_id, {', '.join(columns)}) SELECT $1, u.*")
+        assert "$2::text[]" in query and "$8::int8[]" in query and "$10::float8[]" in query
+        assert args[0] == "run-1"
+        assert len(args) == len(columns) + 1
+        by_column = dict(zip(columns, args[1:]))
+        assert by_column["symbol"] == ["PASS", "FAIL"]
+        assert by_column["market_cap"] == [5_000_000_000, 3_000_000_000]
+        assert all(isinstance(v, int) for v in by_column["market_cap"])
+        assert by_column["pe_ratio"] == [15, 25]
+
+    def test_save_run_sync_reuses_one_bounded_pool(self, db):
+        _, async_pool = db
+
+        class FakeConn:
+            def transaction(self):
+                return self
+
+            async def __aenter__(self):
+                return self
+
+            async def __aexit__(self, *exc):
+                return False
+
+            async def fetchval(self, query, *args):
+                return "run-1"
+
+            async def execute(self, query, *args):
+                pass
+
+        class FakePool:
+            acquired = 0
+            closed = False
+
+            def acquire(self, timeout=None):
+                self.acquired += 1
+                return FakeConn()
+
+            async def close(self):
+                self.closed = True
+
+        pool = FakePool()
+
+        async def create_pool(dsn, **kwargs):
+            return pool
+
+        create_pool = Mock(side_effect=create_pool)
+        async_pool.asyncpg.create_pool = create_pool
+        blocks = [(("symbol",), ("text",), [["A", "B"]])]
+
+        async def save_from_loop():
+            return async_pool.save_run_sync("postgres://db", {"config_name": "T"}, blocks)
+
+        try:
+            assert async_pool.save_run_sync("postgres://db", {"config_name": "T"}, blocks) == "run-1"
+            # Desde un event loop en marcha no puede usarse asyncio.run
+            assert asyncio.run(save_from_loop()) == "run-1"
+        finally:
+            async_pool.close()
+
+        create_pool.assert_called_once()
+        assert create_pool.call_args.kwargs["max_size"] == async_pool.POOL_MAX_SIZE
+        assert create_pool.call_args.kwargs["statement_cache_size"] == 0
+        assert pool.acquired == 2
+        assert pool.closed
+
+    def test_unnest_blocks_split_schemas_and_encode_jsonb(self, db):
+        supabase_client, _ = db
+        rows = [
+            {"run_id": None, "symbol": "A", "flags": ["cheap"]},
+            {"run_id": None, "symbol": "B"},
+            {"run_id": None, "symbol": "C", "flags": None},
+        ]
+
+        blocks = supabase_client._unnest_blocks(rows)
+
+        assert blocks == [
+            (("symbol", "flags"), ("text", "jsonb"), [["A", "C"], ['["cheap"]', None]]),
+            (("symbol",), ("text",), [["B"]]),
+        ]
+
 
 # === Tests de API (Mocked) ===
 